@@ -1,7 +1,7 @@
 import streamlit as st
 import requests  # Importa a nova biblioteca
-from firebase_admin import auth
 from firebase_utils import log_activity # Importa apenas a função de log
+from autenticacao import entrar_com_senha, papel_do_usuario
 
 # --- CONFIGURAÇÕES DA PÁGINA ---
 st.set_page_config(page_title="Controle de ASO", page_icon="🩺", layout="wide")
@@ -17,30 +17,13 @@ if "authentication_status" not in st.session_state:
 
 # --- NOVA LÓGICA DE LOGIN USANDO A API REST ---
 def login_user(email, password):
-    # Pega a chave da API Web do arquivo de segredos
-    api_key = st.secrets["firebase_config"]["apiKey"]
-    
-    # Monta a URL da API de autenticação do Firebase
-    rest_api_url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
-    
-    # Prepara os dados para enviar na requisição
-    payload = {
-        "email": email,
-        "password": password,
-        "returnSecureToken": True
-    }
-    
     try:
-        # Faz a requisição POST para a API
-        response = requests.post(rest_api_url, json=payload)
-        response.raise_for_status()  # Lança um erro se a resposta for de falha (4xx ou 5xx)
-        
-        user_data = response.json()
+        # Faz a requisição POST para a API (conexão reaproveitada entre logins)
+        user_data = entrar_com_senha(email, password)
         uid = user_data['localId']
         
-        # Após o login bem-sucedido, usa o firebase-admin para pegar as permissões (role)
-        user_record = auth.get_user(uid)
-        role = user_record.custom_claims.get('role', 'usuario') if user_record.custom_claims else 'usuario'
+        # As permissões (role) vêm da claim do idToken, verificado localmente
+        role = papel_do_usuario(user_data)
 
         # Atualiza o estado da sessão
         st.session_state.update({
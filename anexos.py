@@ -0,0 +1,397 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import streamlit as st
+from PIL import Image, ImageOps
+from firebase_utils import obter_bucket, obter_db, firestore
+from aso_sync import COLECAO_ASOS, campos_de_atualizacao
+from anexos_caminhos import PREFIXO_CONTEUDO, PREFIXO_MINIATURAS, caminho_do_anexo, caminho_miniatura, caminhos_do_aso
+from anexos_limpeza import TAMANHO_LOTE_STORAGE, excluir_em_lote, ainda_referenciados
+
+# --- Upload de anexos ---
+# Os arquivos são enviados em paralelo (com limite de conexões simultâneas),
+# lidos direto do objeto enviado pelo usuário em vez de copiados com
+# getvalue(). PDFs grandes usam upload resumível em blocos.
+# Antes do envio, cada arquivo passa por um processamento:
+#   - fotos são reduzidas (lado maior até DIMENSAO_MAXIMA) e recomprimidas em
+#     JPEG, e ganham uma miniatura para as pré-visualizações;
+#   - o blob é gravado pelo hash (SHA-256) do arquivo original:
+#         asos/conteudo/<hash>.<ext>      asos/miniaturas/<hash>.jpg
+#     então o mesmo arquivo anexado a vários ASOs é enviado uma única vez e
+#     compartilhado. Por isso um anexo compartilhado só pode ser removido do
+#     Storage quando nenhum outro ASO o referencia (ver agendar_limpeza).
+# Os ASOs guardam o caminho do blob, não uma URL, e os blobs não são públicos.
+# Na exibição, url_anexo gera uma URL assinada V4 localmente, com a chave da
+# conta de serviço (sem ida ao servidor), guardada num cache LRU que expira
+# antes da assinatura. Valores antigos (URLs completas em `anexos` e
+# `url_arquivo_aso`) continuam funcionando e são convertidos em lotes por:
+#     python anexos.py --migrar [--simular]
+
+MAX_UPLOADS_SIMULTANEOS = 4
+# Acima deste tamanho o upload é resumível, em blocos de TAMANHO_BLOCO
+LIMITE_UPLOAD_RESUMIVEL = 8 * 1024 * 1024
+TAMANHO_BLOCO = 4 * 1024 * 1024  # múltiplo de 256 KB, exigido pelo Storage
+
+TIPOS_IMAGEM = {"image/jpeg", "image/png"}
+DIMENSAO_MAXIMA = 2000
+QUALIDADE_JPEG = 80
+DIMENSAO_MINIATURA = 320
+QUALIDADE_MINIATURA = 70
+
+# A URL em cache vale por pelo menos VALIDADE_URL - TTL_CACHE_URLS depois de servida
+VALIDADE_URL = timedelta(hours=2)
+TTL_CACHE_URLS = 60 * 60
+MAX_URLS_CACHE = 10000
+TAMANHO_LOTE_MIGRACAO = 500
+# A fila de limpeza junta os anexos de ASOs excluídos por até este tempo (s)
+INTERVALO_LIMPEZA = 5.0
+# Carência (s) entre entrar na fila e a conferência no Firestore: cobre o envio
+# de um formulário que reaproveitou o mesmo blob e ainda não gravou o ASO
+CARENCIA_LIMPEZA = 10 * 60
+
+
+def _hash_conteudo(arquivo):
+    digest = hashlib.sha256()
+    arquivo.seek(0)
+    for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+        digest.update(bloco)
+    arquivo.seek(0)
+    return digest.hexdigest()
+
+
+def _extensao(nome_arquivo, tipo):
+    if tipo == "image/jpeg":
+        return ".jpg"
+    return os.path.splitext(nome_arquivo)[1].lower()
+
+
+def _em_jpeg(imagem, qualidade):
+    saida = io.BytesIO()
+    imagem.save(saida, "JPEG", quality=qualidade, optimize=True)
+    return saida.getvalue()
+
+
+def processar_imagem(arquivo, tamanho_original):
+    """
+    Reduz e recomprime a foto. Devolve (bytes, content_type, miniatura): a
+    versão recomprimida só substitui a original se ficar menor. None se o
+    arquivo não puder ser processado (truncado, modo de cor inesperado...):
+    nesse caso ele é enviado como veio.
+    """
+    try:
+        return _recomprimir(arquivo, tamanho_original)
+    except Exception as e:
+        print(f"Anexo enviado sem processamento ({getattr(arquivo, 'name', '')}): {e}")
+        return None
+
+
+def _recomprimir(arquivo, tamanho_original):
+    imagem = Image.open(arquivo)
+    # JPEGs grandes já são decodificados em escala reduzida (bem mais rápido)
+    imagem.draft("RGB", (DIMENSAO_MAXIMA, DIMENSAO_MAXIMA))
+    imagem = ImageOps.exif_transpose(imagem)
+    if imagem.mode in ("RGBA", "LA") or (imagem.mode == "P" and "transparency" in imagem.info):
+        # Sem transparência no JPEG: fundo branco, como o papel do ASO
+        imagem = imagem.convert("RGBA")
+        fundo = Image.new("RGB", imagem.size, "white")
+        fundo.paste(imagem, mask=imagem.getchannel("A"))
+        imagem = fundo
+    else:
+        imagem = imagem.convert("RGB")
+    imagem.thumbnail((DIMENSAO_MAXIMA, DIMENSAO_MAXIMA))
+    dados = _em_jpeg(imagem, QUALIDADE_JPEG)
+    imagem.thumbnail((DIMENSAO_MINIATURA, DIMENSAO_MINIATURA))
+    miniatura = _em_jpeg(imagem, QUALIDADE_MINIATURA)
+    if tamanho_original is not None and len(dados) >= tamanho_original:
+        return None, None, miniatura
+    return dados, "image/jpeg", miniatura
+
+
+def _blob_existente(prefixo):
+    return next(iter(obter_bucket().list_blobs(prefix=prefixo, max_results=1)), None)
+
+
+def _enviar_arquivo(arquivo, uid):
+    """Processa e envia o arquivo. Devolve (caminho do anexo, caminhos criados nesta chamada)."""
+    hash_conteudo = _hash_conteudo(arquivo)
+    existente = _blob_existente(f"{PREFIXO_CONTEUDO}{hash_conteudo}.")
+    if existente is not None:
+        # Mesmo arquivo já enviado para outro ASO: só reaproveita a referência
+        return existente.name, []
+
+    tamanho = getattr(arquivo, "size", None)
+    dados, tipo, miniatura = None, arquivo.type, None
+    if arquivo.type in TIPOS_IMAGEM:
+        processado = processar_imagem(arquivo, tamanho)
+        if processado is not None:
+            dados, tipo_processado, miniatura = processado
+            tipo = tipo_processado or tipo
+        arquivo.seek(0)
+
+    criados = []
+    metadados = {"enviado_por": uid, "nome_original": arquivo.name}
+    # A miniatura vai antes: se o anexo existe, a miniatura dele também existe
+    if miniatura is not None:
+        blob_miniatura = obter_bucket().blob(f"{PREFIXO_MINIATURAS}{hash_conteudo}.jpg")
+        blob_miniatura.metadata = metadados
+        blob_miniatura.upload_from_string(miniatura, content_type="image/jpeg")
+        criados.append(blob_miniatura.name)
+
+    blob = obter_bucket().blob(f"{PREFIXO_CONTEUDO}{hash_conteudo}{_extensao(arquivo.name, tipo)}")
+    blob.metadata = metadados
+    try:
+        if dados is not None:
+            blob.upload_from_string(dados, content_type=tipo)
+        else:
+            if tamanho and tamanho > LIMITE_UPLOAD_RESUMIVEL:
+                blob.chunk_size = TAMANHO_BLOCO
+            blob.upload_from_file(arquivo, content_type=tipo, size=tamanho)
+    except Exception:
+        remover_blobs(criados)
+        raise
+    criados.append(blob.name)
+    return blob.name, criados
+
+
+# --- Caminhos e URLs de download ---
+
+@st.cache_data(ttl=TTL_CACHE_URLS, max_entries=MAX_URLS_CACHE, show_spinner=False)
+def _url_assinada(caminho):
+    # Assinada com a chave privada da conta de serviço: nenhuma chamada de rede
+    blob = obter_bucket().blob(caminho)
+    return blob.generate_signed_url(version="v4", expiration=VALIDADE_URL, method="GET")
+
+
+def url_anexo(valor):
+    """URL de download de um anexo (caminho ou URL antiga). Links de fora do Storage voltam como estão."""
+    caminho = caminho_do_anexo(valor)
+    return _url_assinada(caminho) if caminho else valor
+
+
+def url_miniatura(valor):
+    """URL da miniatura de um anexo de imagem gravado por conteúdo, ou None."""
+    caminho = caminho_miniatura(caminho_do_anexo(valor))
+    return _url_assinada(caminho) if caminho else None
+
+
+def nome_do_anexo(valor):
+    """Nome para exibir: o arquivo original nos caminhos antigos (asos/<uid>/<data>_<nome>)."""
+    caminho = caminho_do_anexo(valor) or valor
+    nome = caminho.rsplit("/", 1)[-1]
+    if caminho.startswith(PREFIXO_CONTEUDO):
+        return f"Anexo {os.path.splitext(nome)[1].lstrip('.').upper()}"
+    data, separador, resto = nome.partition("_")
+    return resto if separador and data.isdigit() and resto else nome
+
+
+def _com_miniaturas(caminhos):
+    resultado = []
+    for caminho in dict.fromkeys(caminhos):
+        resultado.append(caminho)
+        miniatura = caminho_miniatura(caminho)
+        if miniatura:
+            resultado.append(miniatura)
+    return resultado
+
+
+def remover_blobs(caminhos):
+    """Remove blobs já enviados (ex.: quando a gravação no Firestore falha)."""
+    if not caminhos:
+        return
+    for caminho in excluir_em_lote(obter_bucket(), caminhos):
+        print(f"Erro ao remover anexo {caminho}")
+
+
+# --- Limpeza assíncrona dos anexos de ASOs excluídos ou removidos na edição ---
+# Excluir um ASO (ou tirar anexos dele) não espera o Storage: os caminhos entram numa fila
+# e uma thread de fundo os remove em requisições batch, quando o lote enche ou
+# INTERVALO_LIMPEZA segundos depois do primeiro item. Anexos que outro ASO
+# ainda cita no Firestore (compartilhados pelo hash) ficam; o snapshot local
+# não serve para isso, porque pode estar atrasado em relação a outro processo.
+# Cada caminho só é conferido CARENCIA_LIMPEZA segundos depois de entrar na
+# fila: um envio simultâneo pode ter reaproveitado o blob (deduplicação por
+# hash) sem ter gravado ainda o ASO que vai citá-lo. O que se perder na fila
+# (ex.: o processo reiniciar) é recolhido pelo job de anexos_limpeza.py.
+
+class _FilaLimpezaAnexos:
+    def __init__(self):
+        self.fila = queue.Queue()
+        self.removidos = 0
+        self._thread = threading.Thread(target=self._executar, name="limpeza-anexos", daemon=True)
+        self._thread.start()
+
+    def enfileirar(self, caminhos):
+        prazo = time.monotonic() + CARENCIA_LIMPEZA
+        for caminho in caminhos:
+            self.fila.put((caminho, prazo))
+
+    @staticmethod
+    def _aguardar(prazo):
+        time.sleep(max(0.0, prazo - time.monotonic()))
+
+    def _executar(self):
+        # Os prazos crescem na ordem da fila: um item que vence depois do lote atual
+        # fica guardado como o primeiro do próximo
+        proximo = None
+        while True:
+            caminho, prazo = proximo or self.fila.get()
+            proximo = None
+            self._aguardar(prazo)
+            lote = [caminho]
+            limite = time.monotonic() + INTERVALO_LIMPEZA
+            while len(lote) < TAMANHO_LOTE_STORAGE:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    caminho, prazo = self.fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if prazo > limite:
+                    proximo = (caminho, prazo)
+                    break
+                self._aguardar(prazo)
+                lote.append(caminho)
+            try:
+                self._limpar(lote)
+            except Exception as e:
+                print(f"Erro na limpeza de anexos de ASOs excluídos: {e}")
+
+    def _limpar(self, caminhos):
+        citados = ainda_referenciados(obter_db(), caminhos)
+        remover = _com_miniaturas(c for c in caminhos if c not in citados)
+        falhas = excluir_em_lote(obter_bucket(), remover)
+        self.removidos += len(remover) - len(falhas)
+
+
+@st.cache_resource
+def obter_fila_limpeza():
+    # Uma fila (e uma thread) por processo
+    return _FilaLimpezaAnexos()
+
+
+def agendar_limpeza(aso):
+    """
+    Coloca na fila de limpeza os anexos de um ASO excluído (dict com os dados
+    dele) ou os removidos numa edição ({'anexos': [...]}).
+    """
+    caminhos = caminhos_do_aso(aso or {})
+    if caminhos:
+        obter_fila_limpeza().enfileirar(caminhos)
+
+
+def enviar_anexos(arquivos, uid, ao_concluir=None):
+    """
+    Processa e envia os arquivos em paralelo. Devolve (anexos, criados): os
+    caminhos a gravar no ASO, na mesma ordem de `arquivos`, e os blobs criados por esta chamada
+    (os reaproveitados de outros ASOs não entram, para não serem removidos
+    num desfazer). `ao_concluir(arquivo, concluidos, total)` é chamado na
+    thread do script a cada arquivo terminado, para atualizar o progresso.
+    Se algum envio falhar, os que já foram enviados são removidos e o erro
+    é relançado.
+    """
+    if not arquivos:
+        return [], []
+    anexos = [None] * len(arquivos)
+    enviados = []
+    concluidos = 0
+    erro = None
+    with ThreadPoolExecutor(max_workers=MAX_UPLOADS_SIMULTANEOS) as executor:
+        futuros = {executor.submit(_enviar_arquivo, arquivo, uid): i for i, arquivo in enumerate(arquivos)}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                anexos[i], criados = futuro.result()
+                enviados.extend(criados)
+                concluidos += 1
+            except Exception as e:
+                erro = erro or e
+                for pendente in futuros:
+                    pendente.cancel()
+                continue
+            if ao_concluir:
+                ao_concluir(arquivos[i], concluidos, len(arquivos))
+    if erro is not None:
+        remover_blobs(enviados)
+        raise erro
+    return anexos, enviados
+
+
+def enviar_anexos_com_progresso(arquivos, uid):
+    """`enviar_anexos` com uma barra de progresso e uma linha de status por arquivo."""
+    if not arquivos:
+        return [], []
+    barra = st.progress(0.0, text=f"Enviando {len(arquivos)} anexo(s)...")
+    linhas = {id(arquivo): st.empty() for arquivo in arquivos}
+    for arquivo in arquivos:
+        linhas[id(arquivo)].caption(f"⏳ {arquivo.name}")
+
+    def ao_concluir(arquivo, concluidos, total):
+        linhas[id(arquivo)].caption(f"✅ {arquivo.name}")
+        barra.progress(concluidos / total, text=f"{concluidos} de {total} anexo(s) enviados")
+
+    return enviar_anexos(arquivos, uid, ao_concluir)
+
+
+# --- Migração dos anexos antigos (URLs) para caminhos ---
+
+def _anexos_migrados(aso):
+    """Nova lista de anexos do ASO, ou None se ele não tem nada a migrar."""
+    atuais = list(aso.get('anexos') or [])
+    valores = atuais + ([aso['url_arquivo_aso']] if aso.get('url_arquivo_aso') else [])
+    # Links de fora do Storage ficam como estão; repetidos são descartados
+    caminhos = list(dict.fromkeys(caminho_do_anexo(v) or v for v in valores))
+    if caminhos == atuais and 'url_arquivo_aso' not in aso:
+        return None
+    return caminhos
+
+
+def migrar_anexos_legados(simular=False):
+    """
+    Troca URLs por caminhos em `anexos` e move `url_arquivo_aso` para a lista,
+    lendo a coleção em páginas e gravando um batch por página. Pode ser
+    executada de novo: ASOs já migrados não são regravados.
+    """
+    db = obter_db()
+    query = db.collection(COLECAO_ASOS).order_by("__name__").select(["anexos", "url_arquivo_aso"])
+    relatorio = {"lidos": 0, "migrados": 0, "simulacao": simular}
+    ultimo = None
+    while True:
+        pagina = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(pagina.limit(TAMANHO_LOTE_MIGRACAO).stream())
+        batch, pendentes = db.batch(), 0
+        for doc in docs:
+            novos = _anexos_migrados(doc.to_dict())
+            if novos is None:
+                continue
+            # updated_at faz os snapshots dos outros processos verem a alteração
+            batch.update(doc.reference, {'anexos': novos, 'url_arquivo_aso': firestore.DELETE_FIELD,
+                                         **campos_de_atualizacao()})
+            pendentes += 1
+        if pendentes and not simular:
+            batch.commit()
+        relatorio["lidos"] += len(docs)
+        relatorio["migrados"] += pendentes
+        if len(docs) < TAMANHO_LOTE_MIGRACAO:
+            return relatorio
+        ultimo = docs[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converte os anexos antigos (URLs) dos ASOs em caminhos do Storage.")
+    parser.add_argument("--migrar", action="store_true", help="executa a migração")
+    parser.add_argument("--simular", action="store_true", help="só conta os ASOs que seriam migrados")
+    args = parser.parse_args()
+    if not args.migrar:
+        parser.print_help()
+        raise SystemExit(1)
+    print("--- Migrando anexos para caminhos do Storage ---")
+    print(json.dumps(migrar_anexos_legados(simular=args.simular), indent=2))
@@ -0,0 +1,54 @@
+import os
+import urllib.parse
+
+# --- Caminhos dos anexos no Storage ---
+# Funções puras (sem Streamlit nem Firebase), usadas tanto pelas páginas (via
+# anexos.py) quanto pelos jobs de manutenção do Storage (anexos_limpeza.py).
+#     asos/<uid>/<data>_<nome>        anexos antigos, um blob por envio
+#     asos/conteudo/<hash>.<ext>      anexos gravados pelo hash do conteúdo
+#     asos/miniaturas/<hash>.jpg      miniatura de um anexo de imagem
+
+PREFIXO_ANEXOS = "asos/"
+PREFIXO_CONTEUDO = "asos/conteudo/"
+PREFIXO_MINIATURAS = "asos/miniaturas/"
+EXTENSOES_IMAGEM = {".jpg", ".jpeg", ".png"}
+
+
+def caminho_do_anexo(valor):
+    """
+    Caminho do blob a partir do valor gravado no ASO: o próprio caminho ou uma
+    URL antiga (download do Firebase, pública ou assinada do Storage, gs://).
+    None se o valor for um link que não aponta para o Storage.
+    """
+    if not valor:
+        return None
+    partes = urllib.parse.urlsplit(valor)
+    if not partes.scheme:
+        return valor
+    if partes.scheme == "gs":
+        caminho = partes.path.lstrip("/")
+    elif partes.netloc == "firebasestorage.googleapis.com" and "/o/" in partes.path:
+        # /v0/b/<bucket>/o/<caminho codificado>
+        caminho = partes.path.split("/o/", 1)[1]
+    elif partes.netloc == "storage.googleapis.com":
+        # /<bucket>/<caminho>
+        caminho = partes.path.lstrip("/").partition("/")[2]
+    elif partes.netloc.endswith(".storage.googleapis.com"):
+        caminho = partes.path.lstrip("/")
+    else:
+        return None
+    return urllib.parse.unquote(caminho) or None
+
+
+def caminho_miniatura(caminho):
+    """Caminho da miniatura de um anexo de imagem gravado por conteúdo, ou None."""
+    if not caminho or not caminho.startswith(PREFIXO_CONTEUDO):
+        return None
+    hash_conteudo, extensao = os.path.splitext(caminho[len(PREFIXO_CONTEUDO):])
+    return f"{PREFIXO_MINIATURAS}{hash_conteudo}.jpg" if extensao in EXTENSOES_IMAGEM else None
+
+
+def caminhos_do_aso(aso):
+    """Caminhos no Storage de todos os anexos do ASO (dict), incluindo `url_arquivo_aso`."""
+    valores = list(aso.get('anexos') or []) + [aso.get('url_arquivo_aso')]
+    return [caminho for caminho in map(caminho_do_anexo, valores) if caminho]
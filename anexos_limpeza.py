@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from anexos_caminhos import PREFIXO_ANEXOS, PREFIXO_CONTEUDO, PREFIXO_MINIATURAS, caminho_miniatura, caminhos_do_aso
+
+# --- Limpeza de anexos órfãos no Storage ---
+# Blobs sob `asos/` que nenhum ASO cita (ASOs excluídos, anexos removidos na
+# edição, envios cujo ASO nunca foi gravado) são encontrados assim:
+#   1. lê os caminhos citados pelos ASOs (coleção em páginas, só os campos de anexo);
+#   2. lista o prefixo no Storage em páginas e separa o que não foi citado;
+#   3. exclui os órfãos em requisições batch de até 100 exclusões.
+# Blobs criados há menos de IDADE_MINIMA ficam de fora (o ASO deles pode ainda
+# estar sendo gravado), e um anexo gravado por hash é reconferido antes de sair,
+# porque outro ASO pode tê-lo reaproveitado durante a execução. A miniatura só
+# sai junto com o anexo. As funções recebem `db` e `bucket` para servirem ao
+# job em main.py e à linha de comando:
+#     python anexos_limpeza.py [--simular] [--idade-minima-horas 24]
+
+COLECAO_ASOS = "asos"
+TAMANHO_PAGINA_ASOS = 500
+TAMANHO_PAGINA_LISTAGEM = 1000
+# Máximo de chamadas por requisição batch do Cloud Storage
+TAMANHO_LOTE_STORAGE = 100
+# Máximo de valores num filtro array_contains_any do Firestore
+MAX_VALORES_CONSULTA = 30
+IDADE_MINIMA = timedelta(hours=24)
+TAMANHO_AMOSTRA = 20
+
+
+def excluir_em_lote(bucket, caminhos):
+    """
+    Exclui os blobs em requisições batch (até TAMANHO_LOTE_STORAGE exclusões
+    cada). Blobs que já não existem não são erro. Devolve os caminhos dos
+    lotes que falharam.
+    """
+    caminhos = list(caminhos)
+    falhas = []
+    for inicio in range(0, len(caminhos), TAMANHO_LOTE_STORAGE):
+        parte = caminhos[inicio:inicio + TAMANHO_LOTE_STORAGE]
+        try:
+            # Sem raise_exception, um 404 de um blob já removido não derruba o lote
+            with bucket.client.batch(raise_exception=False):
+                for caminho in parte:
+                    bucket.blob(caminho).delete()
+        except Exception as e:
+            print(f"Erro ao excluir um lote de {len(parte)} anexo(s): {e}")
+            falhas.extend(parte)
+    return falhas
+
+
+def caminhos_referenciados(db):
+    """Caminhos citados por algum ASO, com as miniaturas dos anexos de imagem."""
+    query = db.collection(COLECAO_ASOS).order_by("__name__").select(["anexos", "url_arquivo_aso"])
+    referenciados, ultimo = set(), None
+    while True:
+        pagina = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(pagina.limit(TAMANHO_PAGINA_ASOS).stream())
+        for doc in docs:
+            for caminho in caminhos_do_aso(doc.to_dict()):
+                referenciados.add(caminho)
+                miniatura = caminho_miniatura(caminho)
+                if miniatura:
+                    referenciados.add(miniatura)
+        if len(docs) < TAMANHO_PAGINA_ASOS:
+            return referenciados
+        ultimo = docs[-1]
+
+
+def ainda_referenciados(db, caminhos):
+    """Quais dos caminhos algum ASO cita agora (consultas array_contains_any de até 30 valores)."""
+    caminhos = list(dict.fromkeys(caminhos))
+    encontrados = set()
+    for inicio in range(0, len(caminhos), MAX_VALORES_CONSULTA):
+        parte = caminhos[inicio:inicio + MAX_VALORES_CONSULTA]
+        query = db.collection(COLECAO_ASOS).where("anexos", "array_contains_any", parte).select(["anexos"])
+        for doc in query.stream():
+            encontrados.update(set(parte).intersection(doc.to_dict().get("anexos") or []))
+    return encontrados
+
+
+def _hash(caminho, prefixo):
+    return os.path.splitext(caminho[len(prefixo):])[0]
+
+
+def limpar_anexos_orfaos(db, bucket, simular=False, idade_minima=IDADE_MINIMA, agora=None):
+    """
+    Exclui os anexos órfãos (ver o cabeçalho do módulo). Com `simular=True`
+    só monta o relatório, com uma amostra dos caminhos que seriam excluídos.
+    """
+    inicio_execucao = time.perf_counter()
+    agora = agora or datetime.now(timezone.utc)
+    # As referências são lidas antes da listagem: o que for enviado depois é recente e fica
+    referenciados = caminhos_referenciados(db)
+    relatorio = {"simulacao": simular, "referenciados": len(referenciados), "listados": 0,
+                 "bytes_listados": 0, "recentes_ignorados": 0, "reaproveitados": 0,
+                 "orfaos": 0, "bytes_orfaos": 0, "excluidos": 0, "falhas": 0}
+
+    candidatos = {}
+    conteudos = set()
+    campos = "items(name,size,timeCreated),nextPageToken"
+    for blob in bucket.list_blobs(prefix=PREFIXO_ANEXOS, page_size=TAMANHO_PAGINA_LISTAGEM, fields=campos):
+        relatorio["listados"] += 1
+        relatorio["bytes_listados"] += blob.size or 0
+        if blob.name.startswith(PREFIXO_CONTEUDO):
+            conteudos.add(_hash(blob.name, PREFIXO_CONTEUDO))
+        if blob.name in referenciados:
+            continue
+        if blob.time_created is not None and agora - blob.time_created < idade_minima:
+            relatorio["recentes_ignorados"] += 1
+            continue
+        candidatos[blob.name] = blob.size or 0
+
+    reaproveitados = ainda_referenciados(db, [c for c in candidatos if c.startswith(PREFIXO_CONTEUDO)])
+    relatorio["reaproveitados"] = len(reaproveitados)
+    orfaos = [c for c in candidatos if c not in reaproveitados]
+    # A miniatura fica enquanto existir um anexo com o mesmo hash que não vai sair
+    removidos = {_hash(c, PREFIXO_CONTEUDO) for c in orfaos if c.startswith(PREFIXO_CONTEUDO)}
+    mantidos = conteudos - removidos
+    orfaos = [c for c in orfaos
+              if not (c.startswith(PREFIXO_MINIATURAS) and _hash(c, PREFIXO_MINIATURAS) in mantidos)]
+
+    relatorio["orfaos"] = len(orfaos)
+    relatorio["bytes_orfaos"] = sum(candidatos[c] for c in orfaos)
+    relatorio["amostra"] = orfaos[:TAMANHO_AMOSTRA]
+    if not simular:
+        falhas = excluir_em_lote(bucket, orfaos)
+        relatorio["falhas"] = len(falhas)
+        relatorio["excluidos"] = len(orfaos) - len(falhas)
+    relatorio["duracao_s"] = round(time.perf_counter() - inicio_execucao, 3)
+    return relatorio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exclui do Storage os anexos que nenhum ASO cita.")
+    parser.add_argument("--simular", action="store_true", help="só mostra o que seria excluído")
+    parser.add_argument("--idade-minima-horas", type=float, default=IDADE_MINIMA.total_seconds() / 3600,
+                        help="ignora blobs mais novos que isso (padrão: 24)")
+    args = parser.parse_args()
+
+    from firebase_utils import obter_db, obter_bucket
+    print("--- Procurando anexos órfãos ---")
+    relatorio = limpar_anexos_orfaos(obter_db(), obter_bucket(), simular=args.simular,
+                                     idade_minima=timedelta(hours=args.idade_minima_horas))
+    print(json.dumps(relatorio, indent=2))
@@ -0,0 +1,197 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import streamlit as st
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow vem com o streamlit, mas o cache em disco é opcional
+    pa = None
+
+# --- Snapshot dos ASOs em disco (Arrow IPC) ---
+# Um processo novo (restart, deploy ou outra réplica na mesma máquina) carrega
+# a coleção `asos` deste arquivo em vez de reler tudo do Firestore, e depois
+# busca só o delta desde a marca d'água gravada junto. O arquivo é gravado sem
+# compressão e lido por memory-map, o que evita copiar os bytes do arquivo na
+# leitura; os documentos em si são convertidos em dicts Python, então cada
+# processo tem a sua cópia em memória, como se tivesse lido do Firestore.
+# Um campo com tipos misturados entre documentos (ex.: texto num ASO e número
+# em outro) não cabe numa coluna Arrow: essa coluna é gravada como JSON.
+# Diretório configurável em .streamlit/secrets.toml (padrão: pasta temporária):
+#     diretorio_snapshot = "/var/cache/aso"
+
+NOME_ARQUIVO = "asos.arrow"
+VERSAO_FORMATO = "2"
+# Intervalo mínimo entre duas gravações do arquivo (em segundos)
+INTERVALO_GRAVACAO = 5 * 60
+COLUNA_UPDATE_TIME = "_update_time"
+MARCA_DATA_JSON = "$data"
+
+_gravando = threading.Lock()
+
+
+def _diretorio():
+    try:
+        diretorio = st.secrets.get("diretorio_snapshot")
+    except Exception:
+        diretorio = None
+    return diretorio or os.path.join(tempfile.gettempdir(), "aso_snapshot")
+
+
+def caminho_snapshot():
+    return os.path.join(_diretorio(), NOME_ARQUIVO)
+
+
+def disponivel():
+    return pa is not None
+
+
+def _para_texto(valor):
+    # update_time é usado como precondição nas edições e precisa dos nanossegundos
+    if valor is None:
+        return None
+    if hasattr(valor, "rfc3339"):
+        return valor.rfc3339()
+    return valor.isoformat()
+
+
+def _de_texto(valor):
+    if valor is None:
+        return None
+    try:
+        from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+        return DatetimeWithNanoseconds.from_rfc3339(valor)
+    except Exception:
+        return datetime.fromisoformat(valor)
+
+
+def _normalizar(valor):
+    # Datas gravadas por este processo (aplicar_local) chegam sem fuso; como no
+    # Firestore, são UTC. Sem isso a coluna inteira poderia ficar sem fuso.
+    if isinstance(valor, datetime) and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def _para_json(valor):
+    def converter(objeto):
+        if isinstance(objeto, datetime):
+            return {MARCA_DATA_JSON: _para_texto(_normalizar(objeto))}
+        # Tipos raros do Firestore (GeoPoint, referências): guardados como texto
+        return str(objeto)
+    return None if valor is None else json.dumps(valor, default=converter)
+
+
+def _de_json(texto):
+    def converter(objeto):
+        if set(objeto) == {MARCA_DATA_JSON}:
+            return _de_texto(objeto[MARCA_DATA_JSON])
+        return objeto
+    return None if texto is None else json.loads(texto, object_hook=converter)
+
+
+def _montar_tabela(linhas):
+    """
+    Uma coluna por campo presente em qualquer documento, com o tipo inferido
+    a partir de todos os valores (from_pylist usaria só a primeira linha e
+    descartaria os campos que faltam nela). Devolve (tabela, campos gravados
+    como JSON).
+    """
+    campos = list(dict.fromkeys(campo for linha in linhas for campo in linha))
+    colunas, em_json = {}, []
+    for campo in campos:
+        valores = [_normalizar(linha.get(campo)) for linha in linhas]
+        try:
+            colunas[campo] = pa.array(valores)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Snapshot em disco: campo '{campo}' com tipos misturados, gravado como JSON ({e})")
+            colunas[campo] = pa.array([_para_json(v) for v in valores], type=pa.string())
+            em_json.append(campo)
+    return pa.table(colunas), em_json
+
+
+def salvar(documentos, tempos_atualizacao, marca_dagua, marca_dagua_exclusoes, sincronizado_em):
+    """
+    Grava o snapshot em disco (substituição atômica). Devolve False se não foi
+    possível montar a tabela.
+    """
+    if pa is None or not _gravando.acquire(blocking=False):
+        return False
+    try:
+        linhas = [{**dados, COLUNA_UPDATE_TIME: _para_texto(tempos_atualizacao.get(aso_id))}
+                  for aso_id, dados in documentos.items()]
+        try:
+            tabela, em_json = _montar_tabela(linhas)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Snapshot em disco não gravado: {e}")
+            return False
+        metadados = {
+            "versao_formato": VERSAO_FORMATO,
+            "marca_dagua": _para_texto(marca_dagua),
+            "marca_dagua_exclusoes": _para_texto(marca_dagua_exclusoes),
+            "sincronizado_em": sincronizado_em,
+            "colunas_json": em_json,
+        }
+        tabela = tabela.replace_schema_metadata({"aso_snapshot": json.dumps(metadados)})
+
+        diretorio = _diretorio()
+        os.makedirs(diretorio, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+            # os.replace é atômico: leitores veem o arquivo antigo ou o novo, nunca um pela metade
+            os.replace(temporario, caminho_snapshot())
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return True
+    finally:
+        _gravando.release()
+
+
+def carregar(idade_maxima):
+    """
+    Lê o snapshot do disco. Devolve None se não existir, estiver num formato
+    antigo ou tiver mais de `idade_maxima` segundos; senão um dict com
+    documentos, tempos_atualizacao, marca_dagua, marca_dagua_exclusoes e
+    sincronizado_em.
+    """
+    caminho = caminho_snapshot()
+    if pa is None or not os.path.exists(caminho):
+        return None
+    try:
+        with pa.memory_map(caminho, "r") as origem:
+            tabela = pa.ipc.open_file(origem).read_all()
+            metadados = json.loads((tabela.schema.metadata or {}).get(b"aso_snapshot", b"{}"))
+            if metadados.get("versao_formato") != VERSAO_FORMATO:
+                return None
+            if time.time() - metadados.get("sincronizado_em", 0) > idade_maxima:
+                return None
+            linhas = tabela.to_pylist()
+    except Exception as e:
+        print(f"Snapshot em disco ignorado: {e}")
+        return None
+
+    documentos, tempos = {}, {}
+    em_json = metadados.get("colunas_json", [])
+    for linha in linhas:
+        update_time = _de_texto(linha.pop(COLUNA_UPDATE_TIME, None))
+        for campo in em_json:
+            linha[campo] = _de_json(linha.get(campo))
+        # Campos ausentes num documento viram nulos na tabela; remove para voltar ao formato original
+        dados = {k: v for k, v in linha.items() if v is not None}
+        documentos[dados['id']] = dados
+        tempos[dados['id']] = update_time
+    return {
+        "documentos": documentos,
+        "tempos_atualizacao": tempos,
+        "marca_dagua": _de_texto(metadados.get("marca_dagua")),
+        "marca_dagua_exclusoes": _de_texto(metadados.get("marca_dagua_exclusoes")),
+        "sincronizado_em": metadados["sincronizado_em"],
+    }
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+
+import streamlit as st
+from firebase_utils import obter_db
+from aso_sync import COLECAO_ASOS, obter_snapshot_asos
+
+# --- Modo em tempo real (opcional) ---
+# Um único listener `on_snapshot` por processo aplica as alterações da coleção
+# `asos` no snapshot compartilhado assim que acontecem; as páginas leem o
+# snapshot sem nenhuma ida à rede. Se o listener cair, um supervisor reconecta
+# com backoff exponencial e, enquanto isso, o repositório volta a sincronizar
+# por consulta incremental (polling).
+# Ativação em .streamlit/secrets.toml:
+#     modo_tempo_real = true
+
+INTERVALO_SUPERVISAO = 5
+BACKOFF_INICIAL = 1
+BACKOFF_MAXIMO = 60
+
+
+def modo_tempo_real_ativo():
+    try:
+        return bool(st.secrets.get("modo_tempo_real", False))
+    except Exception:
+        return False
+
+
+class OuvinteASOs:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._watch = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self.conectado = False
+        self.reconexoes = 0
+        self.ultimo_evento = None
+        self._backoff = BACKOFF_INICIAL
+        self._proxima_tentativa = 0.0
+        self._supervisor = threading.Thread(target=self._supervisionar, name="ouvinte-asos", daemon=True)
+
+    def iniciar(self):
+        self._conectar()
+        self._supervisor.start()
+        return self
+
+    def _conectar(self):
+        with self._lock:
+            self.conectado = False
+            self._primeiro_evento = True
+            try:
+                self._watch = obter_db().collection(COLECAO_ASOS).on_snapshot(self._ao_receber)
+            except Exception as e:
+                print(f"Erro ao iniciar o listener de ASOs: {e}")
+                self._watch = None
+                self._agendar_reconexao()
+
+    def _agendar_reconexao(self):
+        # Backoff exponencial com jitter, para não sincronizar reconexões de vários processos
+        self._proxima_tentativa = time.time() + self._backoff * random.uniform(0.5, 1.5)
+        self._backoff = min(self._backoff * 2, BACKOFF_MAXIMO)
+
+    def _ao_receber(self, documentos, mudancas, read_time):
+        # Roda na thread do SDK. O primeiro evento de cada conexão traz a coleção
+        # inteira e substitui o snapshot, cobrindo o que mudou enquanto estava fora.
+        if self._primeiro_evento:
+            self.snapshot.aplicar_eventos(documentos, [], completo=True)
+            self._primeiro_evento = False
+        else:
+            alterados = [m.document for m in mudancas if m.type.name != "REMOVED"]
+            removidos = [m.document.id for m in mudancas if m.type.name == "REMOVED"]
+            self.snapshot.aplicar_eventos(alterados, removidos)
+        self.conectado = True
+        self.ultimo_evento = time.time()
+        self._backoff = BACKOFF_INICIAL
+
+    def _supervisionar(self):
+        while not self._parar.wait(INTERVALO_SUPERVISAO):
+            ativo = self._watch is not None and self._watch.is_active
+            if ativo:
+                continue
+            if self.conectado or self._watch is not None:
+                # Listener caiu: fecha o antigo e agenda a reconexão
+                self.conectado = False
+                try:
+                    if self._watch is not None:
+                        self._watch.unsubscribe()
+                except Exception:
+                    pass
+                self._watch = None
+                self._agendar_reconexao()
+            if time.time() >= self._proxima_tentativa:
+                self.reconexoes += 1
+                self._conectar()
+
+    def saudavel(self):
+        """True quando o snapshot está sendo mantido pelo listener (sem precisar de polling)."""
+        return self.conectado and self._watch is not None and self._watch.is_active
+
+    def parar(self):
+        self._parar.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+
+
+@st.cache_resource
+def obter_ouvinte_asos():
+    # Um listener por processo, compartilhado por todas as sessões
+    return OuvinteASOs(obter_snapshot_asos()).iniciar()
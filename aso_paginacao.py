@@ -0,0 +1,68 @@
+import string
+
+import streamlit as st
+
+# --- Paginação da relação de ASOs ---
+# As páginas são fatias do DataFrame já filtrado e ordenado por nome, montado
+# a partir do snapshot em memória do repositório: como o Dashboard já tem o
+# snapshot carregado, ler a página no Firestore só somaria leituras (e a
+# ordenação do Firestore diferencia maiúsculas, a da lista não).
+
+TAMANHOS_PAGINA = [25, 50, 100]
+LETRAS = ["Todas"] + list(string.ascii_uppercase)
+
+
+def _estado():
+    if 'paginacao_asos' not in st.session_state:
+        st.session_state.paginacao_asos = {
+            "pagina": 0,
+            "letra": None,
+            "tamanho": TAMANHOS_PAGINA[0],
+            "chave_filtros": None,
+        }
+    return st.session_state.paginacao_asos
+
+
+def _reiniciar(estado):
+    estado["pagina"] = 0
+
+
+def controles_paginacao(chave_filtros):
+    """
+    Desenha tamanho de página e salto por letra. Reinicia a navegação quando
+    os filtros, o tamanho ou a letra mudam. Devolve o estado da paginação.
+    """
+    estado = _estado()
+    col_tamanho, col_letra = st.columns(2)
+    tamanho = col_tamanho.selectbox("Itens por página", TAMANHOS_PAGINA,
+                                    index=TAMANHOS_PAGINA.index(estado["tamanho"]))
+    letra = col_letra.selectbox("Ir para a letra", LETRAS,
+                                index=LETRAS.index(estado["letra"] or "Todas"))
+    letra = None if letra == "Todas" else letra
+
+    if (tamanho, letra, chave_filtros) != (estado["tamanho"], estado["letra"], estado["chave_filtros"]):
+        estado.update({"tamanho": tamanho, "letra": letra, "chave_filtros": chave_filtros})
+        _reiniciar(estado)
+    return estado
+
+
+def pagina_local(estado, df_ordenado):
+    """Página atual de um DataFrame já filtrado e ordenado por nome (sem diferenciar maiúsculas)."""
+    inicio = 0
+    if estado["letra"]:
+        nomes = df_ordenado['nome_funcionario'].fillna('').str.upper()
+        inicio = int((nomes < estado["letra"]).sum())
+    inicio += estado["pagina"] * estado["tamanho"]
+    fim = inicio + estado["tamanho"]
+    return df_ordenado.iloc[inicio:fim], fim < len(df_ordenado)
+
+
+def navegacao(estado, tem_proxima):
+    col_ant, col_pag, col_prox = st.columns([1, 2, 1])
+    if col_ant.button("⬅️ Anterior", disabled=estado["pagina"] == 0, key="pagina_anterior"):
+        estado["pagina"] -= 1
+        st.rerun()
+    col_pag.markdown(f"Página **{estado['pagina'] + 1}**")
+    if col_prox.button("Próxima ➡️", disabled=not tem_proxima, key="pagina_proxima"):
+        estado["pagina"] += 1
+        st.rerun()
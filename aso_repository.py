@@ -0,0 +1,175 @@
+import threading
+
+import streamlit as st
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from firebase_utils import obter_db
+from aso_sync import COLECAO_ASOS, obter_snapshot_asos, campos_de_atualizacao, registrar_exclusao, chave_recencia
+from estatisticas_dashboard import adicionar_incrementos, carregar_estatisticas
+from aso_live import modo_tempo_real_ativo, obter_ouvinte_asos
+
+# --- Repositório de ASOs ---
+# Ponto único de leitura e escrita da coleção `asos` para as páginas. Todas as
+# sessões do processo compartilham o mesmo snapshot em memória (via
+# st.cache_resource); as escritas vão para o Firestore e são aplicadas no
+# snapshot na mesma hora, então quem grava vê a alteração sem esperar o cache.
+
+MAX_TENTATIVAS_EXCLUSAO = 3
+
+
+class RepositorioASOs:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._derivados = {}
+        self._lock_derivados = threading.Lock()
+
+    # --- Leitura ---
+
+    @property
+    def versao(self):
+        """Muda sempre que o conteúdo do repositório muda."""
+        return self.snapshot.versao
+
+    def sincronizar(self, forcar=False):
+        # No modo em tempo real o listener mantém o snapshot; o polling só
+        # entra enquanto ele estiver desconectado.
+        if modo_tempo_real_ativo() and obter_ouvinte_asos().saudavel():
+            return self
+        self.snapshot.sincronizar(forcar)
+        return self
+
+    def calcular(self, chave, funcao, referencia=None):
+        """
+        Resultado de `funcao()` guardado até a versão dos dados (ou a
+        `referencia`, ex.: a data de hoje para derivados que dependem dela)
+        mudar. Cada chave guarda um único valor, então use nomes fixos e passe
+        o que varia em `referencia`. Serve para derivados caros (status,
+        agregações) compartilhados entre sessões; não altere o valor devolvido.
+        """
+        versao = self.versao
+        with self._lock_derivados:
+            guardado = self._derivados.get(chave)
+            if guardado is not None and guardado[:2] == (versao, referencia):
+                return guardado[2]
+        valor = funcao()
+        with self._lock_derivados:
+            self._derivados[chave] = (versao, referencia, valor)
+        return valor
+
+    def invalidar(self):
+        """Força a próxima sincronização a consultar o delta no servidor."""
+        self.snapshot.invalidar()
+
+    def dataframe(self):
+        """DataFrame (cópia) com todos os ASOs, com a coluna `id`."""
+        return self.snapshot.dataframe()
+
+    def obter(self, aso_id):
+        """Dados do ASO (dict) ou None se não existir."""
+        dados, _ = self.snapshot.documentos_por_id([aso_id]).get(aso_id, (None, None))
+        return dados
+
+    def obter_varios(self, ids):
+        """{id: (dados, update_time)} para os ids informados (None é ignorado)."""
+        return self.snapshot.documentos_por_id([i for i in ids if i])
+
+    def por_funcionario(self, nome):
+        """ASOs do funcionário (list[dict]), do exame mais recente para o mais antigo."""
+        asos = self.snapshot.por_nome(nome)
+        # ASOs sem data do exame vão para o fim da lista
+        return sorted(asos, key=chave_recencia, reverse=True)
+
+    def atuais(self):
+        """
+        ASO atual (o de exame mais recente) de cada funcionário, como cópias.
+        Vem da visão mantida pelo snapshot: custa O(funcionários), não O(ASOs).
+        """
+        return [dict(aso) for aso in self.snapshot.atuais()]
+
+    def nomes_funcionarios(self):
+        """Nomes dos funcionários com ASO, em ordem alfabética."""
+        return self.snapshot.nomes()
+
+    def documentos(self):
+        """Iterador sobre cópias de todos os ASOs (dict), sem montar um DataFrame."""
+        for aso in self.snapshot.listar():
+            yield dict(aso)
+
+    # --- Escrita (write-through) ---
+    # Cada escrita vai num único batch junto com os incrementos do documento
+    # agregado do Dashboard. O documento substituído é lido do Firestore (o
+    # snapshot pode estar atrasado) e a escrita leva o update_time dele como
+    # pré-condição: se outra sessão alterou ou excluiu o ASO no meio, o batch
+    # inteiro falha em vez de somar a mesma diferença duas vezes.
+
+    def _ler_atual(self, aso_id):
+        return obter_db().collection(COLECAO_ASOS).document(aso_id).get()
+
+    def criar(self, dados):
+        """Cria o ASO e devolve o id gerado."""
+        db = obter_db()
+        dados = {**dados, **campos_de_atualizacao()}
+        ref = db.collection(COLECAO_ASOS).document()
+        batch = db.batch()
+        batch.create(ref, dados)
+        adicionar_incrementos(batch, depois=dados)
+        resultados = batch.commit()
+        carregar_estatisticas.clear()
+        self.snapshot.aplicar_local(ref.id, dados, resultados[0].update_time)
+        return ref.id
+
+    def atualizar(self, aso_id, dados, ultimo_update_time=None):
+        """
+        Atualiza o ASO. Com `ultimo_update_time`, a gravação só acontece se o
+        documento não mudou desde então (senão o Firestore levanta
+        FailedPrecondition).
+        """
+        db = obter_db()
+        atual = self._ler_atual(aso_id)
+        if not atual.exists:
+            raise NotFound(f"O ASO {aso_id} não existe mais.")
+        if ultimo_update_time and atual.update_time != ultimo_update_time:
+            raise FailedPrecondition(f"O ASO {aso_id} foi alterado desde a leitura.")
+        anterior = atual.to_dict()
+        dados = {**dados, **campos_de_atualizacao()}
+        opcao = db.write_option(last_update_time=atual.update_time)
+        batch = db.batch()
+        batch.update(atual.reference, dados, option=opcao)
+        adicionar_incrementos(batch, antes=anterior, depois={**anterior, **dados})
+        resultados = batch.commit()
+        carregar_estatisticas.clear()
+        self.snapshot.aplicar_local(aso_id, dados, resultados[0].update_time, mesclar=True)
+
+    def excluir(self, aso_id, usuario):
+        """Exclui o ASO e devolve os dados que ele tinha (None se já não existia)."""
+        db = obter_db()
+        for tentativa in range(MAX_TENTATIVAS_EXCLUSAO):
+            atual = self._ler_atual(aso_id)
+            if not atual.exists:
+                # Outra sessão excluiu antes: a lápide e os incrementos já foram gravados
+                self.snapshot.remover_local(aso_id)
+                return None
+            anterior = atual.to_dict()
+            batch = db.batch()
+            registrar_exclusao(batch, aso_id, usuario, db.write_option(last_update_time=atual.update_time))
+            adicionar_incrementos(batch, antes=anterior)
+            try:
+                batch.commit()
+                break
+            except FailedPrecondition:
+                # Alterado (ou excluído) entre a leitura e a escrita: relê e tenta de novo
+                if tentativa + 1 == MAX_TENTATIVAS_EXCLUSAO:
+                    raise
+        carregar_estatisticas.clear()
+        self.snapshot.remover_local(aso_id)
+        return anterior
+
+
+@st.cache_resource
+def obter_repositorio():
+    # Um único repositório por processo, compartilhado por todas as sessões
+    return RepositorioASOs(obter_snapshot_asos())
+
+
+def repositorio_asos():
+    """Repositório já sincronizado com as últimas alterações (respeitando o intervalo mínimo)."""
+    return obter_repositorio().sincronizar()
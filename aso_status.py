@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+# --- Classificação de status dos ASOs ---
+# Regra única usada pelo Dashboard e pelos Relatórios. Opera sobre o DataFrame
+# inteiro de uma vez (operações vetorizadas), sem chamar Python por linha.
+
+STATUS_ARQUIVADO = "Arquivado"
+STATUS_VENCIDO = "Vencido"
+STATUS_EM_DIA = "Em dia"
+
+# Limites (em dias) das faixas "Vence em até N dias", em ordem crescente
+LIMITES_PADRAO = (30, 60)
+
+
+def rotulo_vencimento(dias):
+    return f"Vence em até {dias} dias"
+
+
+def status_disponiveis(limites=LIMITES_PADRAO):
+    """Todos os status possíveis, do mais urgente ao menos urgente."""
+    return [STATUS_VENCIDO] + [rotulo_vencimento(d) for d in limites] + [STATUS_EM_DIA, STATUS_ARQUIVADO]
+
+
+def calcular_dias_para_vencer(data_vencimento, hoje=None):
+    """Dias inteiros até o vencimento (negativo se já venceu)."""
+    if hoje is None:
+        hoje = datetime.now(timezone.utc)
+    vencimento = pd.to_datetime(data_vencimento, utc=True)
+    return (vencimento - pd.Timestamp(hoje)).dt.days
+
+
+def classificar_status(df, hoje=None, limites=LIMITES_PADRAO):
+    """
+    Preenche as colunas `data_vencimento` (datetime), `dias_para_vencer` e
+    `Status` do DataFrame de ASOs e o devolve.
+    """
+    df['data_vencimento'] = pd.to_datetime(df['data_vencimento'], utc=True)
+    df['dias_para_vencer'] = calcular_dias_para_vencer(df['data_vencimento'], hoje)
+
+    dias = df['dias_para_vencer'].to_numpy(dtype='float64', na_value=np.nan)
+    if 'tipo_exame' in df:
+        demissional = (df['tipo_exame'] == 'Demissional').to_numpy(dtype=bool, na_value=False)
+    else:
+        demissional = np.zeros(len(df), dtype=bool)
+
+    # As condições são avaliadas em ordem, como na antiga cadeia de if/elif.
+    # Comparações com NaN são falsas, então datas ausentes caem em "Em dia".
+    condicoes = [demissional, dias < 0] + [dias <= limite for limite in limites]
+    escolhas = [STATUS_ARQUIVADO, STATUS_VENCIDO] + [rotulo_vencimento(limite) for limite in limites]
+    df['Status'] = np.select(condicoes, escolhas, default=STATUS_EM_DIA).astype(object)
+    return df
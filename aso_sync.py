@@ -0,0 +1,366 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+from firebase_utils import obter_db, firestore
+import aso_cache_disco
+
+# --- Sincronização incremental da coleção de ASOs ---
+# Em vez de reler a coleção inteira a cada expiração de cache, mantemos um
+# snapshot local por processo e buscamos apenas os documentos alterados desde
+# a última sincronização (marca d'água sobre o campo `updated_at`). Exclusões
+# são registradas como "lápides" na coleção `asos_excluidos`.
+# O snapshot também é gravado em disco (ver aso_cache_disco), e um processo
+# novo parte dele em vez de reler a coleção inteira.
+# Junto com os documentos o snapshot mantém a visão materializada "ASO atual
+# de cada funcionário" (o de exame mais recente), atualizada a cada documento
+# gravado ou removido, para o Dashboard não precisar agrupar o histórico todo.
+
+COLECAO_ASOS = "asos"
+COLECAO_EXCLUIDOS = "asos_excluidos"
+CAMPO_ATUALIZACAO = "updated_at"
+
+# Intervalo mínimo entre duas consultas de delta (em segundos)
+INTERVALO_MINIMO_SYNC = 15
+# Releitura completa periódica: cobre documentos antigos sem `updated_at`
+# alterados fora do sistema e permite expurgar lápides antigas (job
+# purge_old_tombstones em main.py, que depende deste intervalo).
+INTERVALO_RESYNC_COMPLETO = 24 * 60 * 60
+
+
+def _instante(valor):
+    # Datas gravadas por este processo chegam sem fuso; as do Firestore, em UTC
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return valor.timestamp()
+    return float("-inf")
+
+
+def _em_utc(valor):
+    if isinstance(valor, datetime) and valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def chave_recencia(aso):
+    """Ordena os ASOs de um funcionário: o maior é o atual (ASOs sem data do exame ficam por último)."""
+    return (_instante(aso.get('data_exame')), _instante(aso.get('data_vencimento')), aso.get('id') or "")
+
+
+def campos_de_atualizacao():
+    """Campos que todo caminho de escrita em `asos` deve incluir."""
+    return {CAMPO_ATUALIZACAO: firestore.SERVER_TIMESTAMP}
+
+
+def registrar_exclusao(batch, aso_id, usuario, opcao=None):
+    """
+    Adiciona ao batch a exclusão do ASO e a lápide correspondente. `opcao` é
+    a pré-condição da exclusão (ex.: db.write_option(last_update_time=...)).
+    """
+    db = obter_db()
+    batch.delete(db.collection(COLECAO_ASOS).document(aso_id), option=opcao)
+    batch.set(db.collection(COLECAO_EXCLUIDOS).document(aso_id), {
+        "excluido_por": usuario,
+        **campos_de_atualizacao()
+    })
+
+
+class SnapshotASOs:
+    """Cópia local da coleção `asos`, mantida por sincronização incremental."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documentos = {}
+        # update_time de cada documento, usado como precondição nas edições
+        self.tempos_atualizacao = {}
+        self.marca_dagua = None
+        self.marca_dagua_exclusoes = None
+        self.versao = 0
+        self.ultima_sync = 0.0
+        self.ultima_sync_completa = 0.0
+        self.leituras = 0
+        self._df = None
+        self._df_versao = -1
+        # nome -> ids dos ASOs e nome -> (chave_recencia, id) do ASO atual
+        self._ids_por_nome = {}
+        self._atual_por_nome = {}
+        self.ultima_gravacao_disco = 0.0
+
+    def _aplicar(self, doc):
+        data = doc.to_dict()
+        data['id'] = doc.id
+        self._guardar(doc.id, data)
+        self.tempos_atualizacao[doc.id] = doc.update_time
+        return data.get(CAMPO_ATUALIZACAO)
+
+    # --- Visão materializada: ASO atual de cada funcionário ---
+    # Toda alteração em `documentos` passa por _guardar/_descartar (ou por
+    # _reindexar, quando o conteúdo inteiro é trocado). Só o funcionário
+    # afetado é recalculado, olhando apenas os ASOs dele.
+
+    def _guardar(self, aso_id, data):
+        anterior = self.documentos.get(aso_id)
+        self.documentos[aso_id] = data
+        nome = data.get('nome_funcionario')
+        if anterior is not None and anterior.get('nome_funcionario') != nome:
+            self._tirar_do_indice(aso_id, anterior.get('nome_funcionario'))
+        if not nome:
+            return
+        self._ids_por_nome.setdefault(nome, set()).add(aso_id)
+        atual = self._atual_por_nome.get(nome)
+        chave = chave_recencia(data)
+        if atual is not None and atual[1] == aso_id and chave < atual[0]:
+            # O atual ficou mais antigo (ex.: data do exame corrigida): outro pode passar à frente
+            self._recalcular_atual(nome)
+        elif atual is None or atual[1] == aso_id or chave > atual[0]:
+            self._atual_por_nome[nome] = (chave, aso_id)
+
+    def _descartar(self, aso_id):
+        anterior = self.documentos.pop(aso_id, None)
+        self.tempos_atualizacao.pop(aso_id, None)
+        if anterior is not None:
+            self._tirar_do_indice(aso_id, anterior.get('nome_funcionario'))
+        return anterior is not None
+
+    def _tirar_do_indice(self, aso_id, nome):
+        ids = self._ids_por_nome.get(nome)
+        if not ids:
+            return
+        ids.discard(aso_id)
+        if not ids:
+            del self._ids_por_nome[nome]
+            self._atual_por_nome.pop(nome, None)
+        elif self._atual_por_nome.get(nome, (None, None))[1] == aso_id:
+            self._recalcular_atual(nome)
+
+    def _recalcular_atual(self, nome):
+        self._atual_por_nome[nome] = max((chave_recencia(self.documentos[i]), i) for i in self._ids_por_nome[nome])
+
+    def _reindexar(self):
+        self._ids_por_nome = {}
+        self._atual_por_nome = {}
+        for aso_id, data in self.documentos.items():
+            nome = data.get('nome_funcionario')
+            if not nome:
+                continue
+            self._ids_por_nome.setdefault(nome, set()).add(aso_id)
+            chave = chave_recencia(data)
+            atual = self._atual_por_nome.get(nome)
+            if atual is None or chave > atual[0]:
+                self._atual_por_nome[nome] = (chave, aso_id)
+
+    def _sincronizar_completo(self):
+        self.documentos = {}
+        self.tempos_atualizacao = {}
+        self._reindexar()
+        self.marca_dagua = None
+        for doc in obter_db().collection(COLECAO_ASOS).stream():
+            self.leituras += 1
+            atualizado = self._aplicar(doc)
+            if atualizado and (self.marca_dagua is None or atualizado > self.marca_dagua):
+                self.marca_dagua = atualizado
+
+        # A partir de agora só interessam lápides gravadas depois desta leitura
+        ultima_exclusao = (obter_db().collection(COLECAO_EXCLUIDOS)
+                           .order_by(CAMPO_ATUALIZACAO, direction=firestore.Query.DESCENDING)
+                           .limit(1).stream())
+        self.marca_dagua_exclusoes = None
+        for doc in ultima_exclusao:
+            self.leituras += 1
+            self.marca_dagua_exclusoes = doc.to_dict().get(CAMPO_ATUALIZACAO)
+        self.ultima_sync_completa = time.time()
+
+    def _carregar_do_disco(self):
+        estado = aso_cache_disco.carregar(idade_maxima=INTERVALO_RESYNC_COMPLETO)
+        if estado is None:
+            return False
+        self.documentos = estado["documentos"]
+        self.tempos_atualizacao = estado["tempos_atualizacao"]
+        self._reindexar()
+        self.marca_dagua = estado["marca_dagua"]
+        self.marca_dagua_exclusoes = estado["marca_dagua_exclusoes"]
+        # A releitura completa diária continua contando da última feita por algum processo
+        self.ultima_sync_completa = estado["sincronizado_em"]
+        self.ultima_gravacao_disco = time.time()
+        return True
+
+    def _agendar_gravacao_disco(self, forcar=False):
+        # Chamado com o lock adquirido. A gravação roda numa thread à parte com
+        # cópias rasas (os dicts dos documentos são substituídos, nunca alterados).
+        if not aso_cache_disco.disponivel():
+            return
+        agora = time.time()
+        if not forcar and agora - self.ultima_gravacao_disco < aso_cache_disco.INTERVALO_GRAVACAO:
+            return
+        self.ultima_gravacao_disco = agora
+        argumentos = (dict(self.documentos), dict(self.tempos_atualizacao), self.marca_dagua,
+                      self.marca_dagua_exclusoes, self.ultima_sync_completa)
+        threading.Thread(target=self._gravar_disco, args=argumentos, name="snapshot-asos-disco",
+                         daemon=True).start()
+
+    @staticmethod
+    def _gravar_disco(*argumentos):
+        try:
+            aso_cache_disco.salvar(*argumentos)
+        except Exception as e:
+            print(f"Erro ao gravar o snapshot de ASOs em disco: {e}")
+
+    def _sincronizar_delta(self):
+        alterou = False
+        # `>=` em vez de `>`: reler o último documento é barato e idempotente,
+        # e evita perder escritas que compartilham o mesmo carimbo de tempo.
+        query = obter_db().collection(COLECAO_ASOS)
+        if self.marca_dagua is not None:
+            query = query.where(CAMPO_ATUALIZACAO, ">=", self.marca_dagua)
+        else:
+            query = query.order_by(CAMPO_ATUALIZACAO)
+        for doc in query.stream():
+            self.leituras += 1
+            anterior = self.documentos.get(doc.id)
+            atualizado = self._aplicar(doc)
+            if anterior is None or anterior.get(CAMPO_ATUALIZACAO) != atualizado:
+                alterou = True
+            if atualizado and (self.marca_dagua is None or atualizado > self.marca_dagua):
+                self.marca_dagua = atualizado
+
+        query = obter_db().collection(COLECAO_EXCLUIDOS)
+        if self.marca_dagua_exclusoes is not None:
+            query = query.where(CAMPO_ATUALIZACAO, ">=", self.marca_dagua_exclusoes)
+        else:
+            query = query.order_by(CAMPO_ATUALIZACAO)
+        for doc in query.stream():
+            self.leituras += 1
+            atualizado = doc.to_dict().get(CAMPO_ATUALIZACAO)
+            if self._descartar(doc.id):
+                alterou = True
+            if atualizado and (self.marca_dagua_exclusoes is None or atualizado > self.marca_dagua_exclusoes):
+                self.marca_dagua_exclusoes = atualizado
+        return alterou
+
+    def aplicar_eventos(self, alterados, removidos, completo=False):
+        """
+        Aplica documentos alterados e ids removidos vindos de fora (ex.: o
+        listener em tempo real). Com `completo=True`, `alterados` é a coleção
+        inteira e substitui o conteúdo atual.
+        """
+        with self._lock:
+            if completo:
+                self.documentos = {}
+                self.tempos_atualizacao = {}
+                self._reindexar()
+                self.ultima_sync_completa = time.time()
+            for doc in alterados:
+                atualizado = self._aplicar(doc)
+                if atualizado and (self.marca_dagua is None or atualizado > self.marca_dagua):
+                    self.marca_dagua = atualizado
+            for aso_id in removidos:
+                self._descartar(aso_id)
+            self.ultima_sync = time.time()
+            self.versao += 1
+            self._agendar_gravacao_disco(forcar=completo)
+
+    def sincronizar(self, forcar=False):
+        """
+        Atualiza o snapshot. Na primeira chamada parte do snapshot em disco, se
+        houver um recente, e senão lê a coleção inteira (o que também acontece
+        uma vez por dia); nas demais, lê apenas o que mudou desde a marca d'água.
+        """
+        with self._lock:
+            agora = time.time()
+            if not forcar and agora - self.ultima_sync < INTERVALO_MINIMO_SYNC:
+                return
+            if self.ultima_sync == 0.0 and not self.documentos and self._carregar_do_disco():
+                self.versao += 1
+            if agora - self.ultima_sync_completa >= INTERVALO_RESYNC_COMPLETO:
+                self._sincronizar_completo()
+                self.versao += 1
+                self._agendar_gravacao_disco(forcar=True)
+            elif self._sincronizar_delta():
+                self.versao += 1
+                self._agendar_gravacao_disco()
+            self.ultima_sync = agora
+
+    def documentos_por_id(self, ids):
+        """
+        Documentos do snapshot para os ids pedidos, sem ida ao servidor. Os que
+        ainda não estão no snapshot são buscados de uma vez com `get_all`.
+        Devolve {id: (dados, update_time)}.
+        """
+        with self._lock:
+            encontrados = {i: (dict(self.documentos[i]), self.tempos_atualizacao.get(i))
+                           for i in ids if i in self.documentos}
+        faltando = [i for i in ids if i not in encontrados]
+        if faltando:
+            db = obter_db()
+            refs = [db.collection(COLECAO_ASOS).document(i) for i in faltando]
+            with self._lock:
+                for doc in db.get_all(refs):
+                    self.leituras += 1
+                    if doc.exists:
+                        self._aplicar(doc)
+                        encontrados[doc.id] = (dict(self.documentos[doc.id]), doc.update_time)
+                        self.versao += 1
+        return encontrados
+
+    def aplicar_local(self, aso_id, dados, update_time=None, mesclar=False):
+        """
+        Grava no snapshot o resultado de uma escrita feita por este processo,
+        sem esperar a próxima sincronização. Sentinelas como SERVER_TIMESTAMP
+        viram a hora local até o delta trazer o valor definitivo do servidor;
+        datas sem fuso são guardadas em UTC, como o Firestore as devolve.
+        """
+        agora = datetime.now(timezone.utc)
+        dados = {k: (agora if v is firestore.SERVER_TIMESTAMP else _em_utc(v)) for k, v in dados.items()}
+        with self._lock:
+            atual = self.documentos.get(aso_id, {}) if mesclar else {}
+            self._guardar(aso_id, {**atual, **dados, 'id': aso_id})
+            self.tempos_atualizacao[aso_id] = update_time
+            self.versao += 1
+
+    def remover_local(self, aso_id):
+        with self._lock:
+            if self._descartar(aso_id):
+                self.versao += 1
+
+    def listar(self):
+        """Lista (rasa) dos documentos atuais; não alterar os dicts devolvidos."""
+        with self._lock:
+            return list(self.documentos.values())
+
+    def por_nome(self, nome):
+        """ASOs do funcionário (cópias), pelo índice por nome mantido a cada escrita."""
+        with self._lock:
+            return [dict(self.documentos[i]) for i in self._ids_por_nome.get(nome, ())]
+
+    def atuais(self):
+        """ASO atual (o de exame mais recente) de cada funcionário; não alterar os dicts devolvidos."""
+        with self._lock:
+            return [self.documentos[aso_id] for _, aso_id in self._atual_por_nome.values()]
+
+    def nomes(self):
+        """Nomes dos funcionários com ASO, em ordem alfabética."""
+        with self._lock:
+            return sorted(self._ids_por_nome)
+
+    def invalidar(self):
+        """Faz a próxima chamada a `sincronizar` consultar o delta imediatamente."""
+        self.ultima_sync = 0.0
+
+    def dataframe(self):
+        """DataFrame com os ASOs do snapshot; a cópia devolvida pode ser alterada livremente."""
+        with self._lock:
+            if self._df_versao != self.versao:
+                docs = list(self.documentos.values())
+                self._df = pd.DataFrame(docs) if docs else pd.DataFrame()
+                self._df_versao = self.versao
+            return self._df.copy()
+
+
+@st.cache_resource
+def obter_snapshot_asos():
+    # Compartilhado entre todas as sessões do processo
+    return SnapshotASOs()
+
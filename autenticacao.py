@@ -0,0 +1,56 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+import streamlit as st
+from firebase_admin import auth
+from firebase_utils import obter_app
+
+# --- Login via API REST do Firebase Auth ---
+# Uma única sessão HTTP por processo mantém a conexão TLS com o identity
+# toolkit aberta entre logins (keep-alive). O papel (`role`) vem da claim
+# personalizada que já está dentro do idToken devolvido: o token é verificado
+# localmente pelo firebase-admin, que guarda os certificados públicos do Google
+# em cache até expirarem, em vez de uma chamada extra a `auth.get_user`.
+
+URL_LOGIN = "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword"
+TIMEOUT_LOGIN = 10
+# Tolerância para diferença de relógio entre este servidor e o Google
+TOLERANCIA_RELOGIO = 10
+PAPEL_PADRAO = "usuario"
+
+
+@st.cache_resource
+def sessao_http():
+    # Compartilhada por todas as sessões do Streamlit; requests.Session é seguro para uso concorrente
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+
+def entrar_com_senha(email, senha):
+    """
+    Autentica com email e senha. Devolve o JSON da API (localId, email,
+    idToken, ...); credenciais inválidas levantam requests.exceptions.HTTPError.
+    """
+    api_key = st.secrets["firebase_config"]["apiKey"]
+    payload = {
+        "email": email,
+        "password": senha,
+        "returnSecureToken": True
+    }
+    response = sessao_http().post(URL_LOGIN, params={"key": api_key}, json=payload, timeout=TIMEOUT_LOGIN)
+    response.raise_for_status()  # Lança um erro se a resposta for de falha (4xx ou 5xx)
+    return response.json()
+
+
+def papel_do_usuario(user_data):
+    """Papel do usuário a partir do idToken; se a verificação local falhar, consulta o Admin SDK."""
+    obter_app()
+    try:
+        claims = auth.verify_id_token(user_data['idToken'], clock_skew_seconds=TOLERANCIA_RELOGIO)
+        return claims.get('role', PAPEL_PADRAO)
+    except (ValueError, auth.InvalidIdTokenError, auth.CertificateFetchError) as e:
+        print(f"Verificação local do idToken falhou ({e}); consultando o usuário no Firebase Auth.")
+        user_record = auth.get_user(user_data['localId'])
+        return user_record.custom_claims.get('role', PAPEL_PADRAO) if user_record.custom_claims else PAPEL_PADRAO
@@ -0,0 +1,102 @@
+"""
+Benchmark do envio de anexos sobre um Storage em memória.
+
+Gera fotos sintéticas no tamanho de uma câmera de celular (12 MP, JPEG de
+alta qualidade) e um PDF, e compara os bytes recebidos com os gravados no
+Storage depois do processamento (redução, recompressão e miniatura). Envia o
+mesmo lote uma segunda vez para medir a deduplicação por conteúdo: nada
+deveria ser gravado de novo.
+
+Uso:
+    python benchmarks/bench_anexos.py [--fotos 4] [--largura 4032 --altura 3024]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_firebase  # noqa: E402
+
+firebase_utils, db, bucket = fake_firebase.instalar()
+
+import anexos  # noqa: E402
+
+
+class ArquivoEnviado(io.BytesIO):
+    """Imita o UploadedFile do Streamlit (BytesIO com nome, tipo e tamanho)."""
+
+    def __init__(self, dados, nome, tipo):
+        super().__init__(dados)
+        self.name = nome
+        self.type = tipo
+        self.size = len(dados)
+
+
+def foto_sintetica(largura, altura, semente):
+    # Gradiente com ruído: comprime mal, como uma foto de papel sob luz irregular
+    rng = np.random.default_rng(semente)
+    x = np.linspace(0, 255, largura, dtype=np.float32)
+    y = np.linspace(0, 255, altura, dtype=np.float32)[:, None]
+    base = (x * 0.6 + y * 0.4)[..., None].repeat(3, axis=2)
+    ruido = rng.normal(0, 18, (altura, largura, 3)).astype(np.float32)
+    pixels = np.clip(base + ruido, 0, 255).astype(np.uint8)
+    saida = io.BytesIO()
+    Image.fromarray(pixels).save(saida, "JPEG", quality=92)
+    return saida.getvalue()
+
+
+def lote(fotos, largura, altura):
+    arquivos = [ArquivoEnviado(foto_sintetica(largura, altura, i), f"foto_{i}.jpg", "image/jpeg")
+                for i in range(fotos)]
+    pdf = b"%PDF-1.4\n" + np.random.default_rng(99).bytes(2 * 1024 * 1024)
+    arquivos.append(ArquivoEnviado(pdf, "exames.pdf", "application/pdf"))
+    return arquivos
+
+
+def bytes_no_storage():
+    return sum(len(dados) for dados in bucket.arquivos.values())
+
+
+def enviar(arquivos):
+    inicio = time.perf_counter()
+    urls, criados = anexos.enviar_anexos(arquivos, "benchmark")
+    return time.perf_counter() - inicio, urls, criados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fotos", type=int, default=4)
+    parser.add_argument("--largura", type=int, default=4032)
+    parser.add_argument("--altura", type=int, default=3024)
+    args = parser.parse_args()
+
+    arquivos = lote(args.fotos, args.largura, args.altura)
+    recebidos = sum(a.size for a in arquivos)
+
+    duracao, urls, criados = enviar(arquivos)
+    gravados = bytes_no_storage()
+    miniaturas = [n for n in bucket.arquivos if n.startswith(anexos.PREFIXO_MINIATURAS)]
+    bytes_miniaturas = sum(len(bucket.arquivos[n]) for n in miniaturas)
+
+    duracao_repetido, urls_repetidas, criados_repetido = enviar(arquivos)
+
+    print(f"{'':28}{'arquivos':>10}{'MB':>10}{'tempo (s)':>12}")
+    print(f"{'recebidos':28}{len(arquivos):>10}{recebidos / 2**20:>10.2f}")
+    print(f"{'gravados (1º envio)':28}{len(criados):>10}{gravados / 2**20:>10.2f}{duracao:>12.3f}")
+    print(f"{'  dos quais miniaturas':28}{len(miniaturas):>10}{bytes_miniaturas / 2**20:>10.2f}")
+    print(f"{'gravados (mesmo lote)':28}{len(criados_repetido):>10}{(bytes_no_storage() - gravados) / 2**20:>10.2f}"
+          f"{duracao_repetido:>12.3f}")
+    print(f"Redução: {1 - gravados / recebidos:.0%} dos bytes; "
+          f"URLs iguais no reenvio: {urls == urls_repetidas}")
+
+
+if __name__ == "__main__":
+    main()
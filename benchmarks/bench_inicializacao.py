@@ -0,0 +1,117 @@
+"""
+Benchmark do custo de inicialização de cada página (imports + clientes Firebase).
+
+Compara, num processo Python novo por medição, o comportamento antigo de
+`firebase_utils` (Firestore e Storage criados ao importar o módulo) com os
+clientes sob demanda: cada página só cria o que usa na primeira renderização.
+Nenhuma chamada de rede é feita: o app é inicializado com uma conta de serviço
+gerada na hora, e os clientes só abrem conexão na primeira requisição.
+
+Uso:
+    python benchmarks/bench_inicializacao.py [--repeticoes 5]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Clientes que cada página usa na primeira renderização (o Storage só entra
+# ao enviar ou remover anexos, e o Login só grava o log numa thread de fundo)
+PAGINAS = {
+    "login": ("1_🏠_Login.py", []),
+    "dashboard": ("pages/2_📊_Dashboard.py", ["obter_db"]),
+    "lancar_aso": ("pages/3_📝_Lançar_ASO.py", []),
+    "admin": ("pages/4_⚙️_Admin.py", ["obter_app"]),
+    "logs": ("pages/5_📜_Logs_de_Atividade.py", ["obter_db"]),
+    "historico": ("pages/6_👨‍💼_Histórico_por_Funcionário.py", ["obter_db"]),
+    "relatorios": ("pages/7_📄_Relatórios_XLSX.py", ["obter_db"]),
+}
+
+
+def _conta_de_servico():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = chave.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                              serialization.NoEncryption()).decode()
+    return {
+        "type": "service_account",
+        "project_id": "benchmark",
+        "private_key_id": "benchmark",
+        "private_key": pem,
+        "client_email": "benchmark@benchmark.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+def _imports_da_pagina(script):
+    """Só as instruções de import de nível superior da página."""
+    with open(os.path.join(RAIZ, script), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    corpo = [no for no in arvore.body if isinstance(no, (ast.Import, ast.ImportFrom))]
+    return compile(ast.Module(body=corpo, type_ignores=[]), script, "exec")
+
+
+def _medir_no_filho(pagina, modo):
+    sys.path.insert(0, RAIZ)
+    os.chdir(RAIZ)
+    script, acessores = PAGINAS[pagina]
+    codigo = _imports_da_pagina(script)
+
+    # Fora da medição: o app do Firebase existe nos dois modos
+    import firebase_admin
+    from firebase_admin import credentials
+    firebase_admin.initialize_app(credentials.Certificate(_conta_de_servico()),
+                                  {"storageBucket": "benchmark.appspot.com"})
+
+    inicio = time.perf_counter()
+    if modo == "antes":
+        # Comportamento antigo: os dois clientes criados ao importar firebase_utils
+        from firebase_admin import firestore, storage
+        firestore.client()
+        storage.bucket()
+        exec(codigo, {})
+    else:
+        exec(codigo, {})
+        import firebase_utils
+        for acessor in acessores:
+            getattr(firebase_utils, acessor)()
+    return time.perf_counter() - inicio
+
+
+def _medir(pagina, modo):
+    resultado = subprocess.run([sys.executable, __file__, "--filho", pagina, modo],
+                               capture_output=True, text=True, cwd=RAIZ)
+    if resultado.returncode != 0:
+        raise RuntimeError(f"Falha ao medir '{pagina}' ({modo}):\n{resultado.stderr}")
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--filho", nargs=2, metavar=("PAGINA", "MODO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(_medir_no_filho(*args.filho)))
+        return 0
+
+    print(f"{'página':<12} {'antes (ms)':>11} {'sob demanda (ms)':>17} {'ganho':>7}")
+    for pagina in PAGINAS:
+        # Mediana de vários processos novos: imports frios variam bastante
+        antes = statistics.median(_medir(pagina, "antes") for _ in range(args.repeticoes))
+        depois = statistics.median(_medir(pagina, "depois") for _ in range(args.repeticoes))
+        print(f"{pagina:<12} {antes * 1000:>11.0f} {depois * 1000:>17.0f} {antes / depois:>6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
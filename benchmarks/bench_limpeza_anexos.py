@@ -0,0 +1,71 @@
+"""
+Benchmark da limpeza de anexos órfãos sobre um Firestore/Storage em memória.
+
+Semeia N ASOs com anexos (gravados por hash, com miniatura, e antigos por
+URL) e uma fração de blobs órfãos, roda a limpeza em simulação e de verdade
+e conta as requisições de exclusão ao Storage: em lote (até 100 por
+requisição) contra uma por blob, como antes.
+
+Uso:
+    python benchmarks/bench_limpeza_anexos.py [--tamanhos 1000 10000] [--fracao-orfaos 0.2]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_firebase  # noqa: E402
+
+from anexos_limpeza import limpar_anexos_orfaos  # noqa: E402
+
+
+def semear(n, fracao_orfaos, semente=7):
+    db, bucket = fake_firebase.FakeFirestore(), fake_firebase.FakeBucket()
+    rng = random.Random(semente)
+    antigo = datetime.now(timezone.utc) - timedelta(days=30)
+
+    def blob(caminho):
+        bucket.arquivos[caminho] = b"0" * rng.randrange(50_000, 400_000)
+        bucket.criados[caminho] = antigo
+        return caminho
+
+    colecao = db.collection("asos")
+    for i in range(n):
+        hash_conteudo = f"{i:064x}"
+        anexos = [blob(f"asos/conteudo/{hash_conteudo}.jpg")]
+        blob(f"asos/miniaturas/{hash_conteudo}.jpg")
+        dados = {"nome_funcionario": f"Funcionário {i}", "anexos": anexos}
+        if i % 3 == 0:
+            legado = blob(f"asos/uid{i % 50}/20240101000000_aso_{i}.pdf")
+            dados["url_arquivo_aso"] = f"https://storage.googleapis.com/{bucket.name}/{legado}"
+        if rng.random() < fracao_orfaos:
+            continue  # ASO excluído: os blobs ficaram para trás
+        colecao.document(f"aso{i:07d}").set(dados)
+    return db, bucket
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--fracao-orfaos", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'ASOs':>8}{'blobs':>9}{'órfãos':>9}{'MB órfãos':>11}{'simulação (s)':>15}"
+          f"{'limpeza (s)':>13}{'req. lote':>11}{'req. 1 a 1':>12}")
+    for n in args.tamanhos:
+        db, bucket = semear(n, args.fracao_orfaos)
+        simulacao = limpar_anexos_orfaos(db, bucket, simular=True)
+        relatorio = limpar_anexos_orfaos(db, bucket)
+        assert relatorio["excluidos"] == simulacao["orfaos"]
+        print(f"{n:>8}{relatorio['listados']:>9}{relatorio['orfaos']:>9}{relatorio['bytes_orfaos'] / 2**20:>11.1f}"
+              f"{simulacao['duracao_s']:>15.3f}{relatorio['duracao_s']:>13.3f}"
+              f"{bucket.client.requisicoes:>11}{relatorio['excluidos']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Benchmark das páginas do app sobre um Firestore/Storage em memória.
+
+Cada página roda pelo AppTest do Streamlit com N ASOs e N logs sintéticos.
+Para cada página e tamanho, mede o tempo da primeira execução (fria) e de um
+rerun com interação (quente), o pico de memória, os documentos lidos e o
+número de widgets. Os resultados podem ser gravados como baseline em JSON e
+comparados nas execuções seguintes para pegar regressões.
+
+Uma mudança é comparada com a baseline que já está no repositório; só depois
+de revisada a comparação a baseline é atualizada, num commit à parte.
+--salvar-baseline só acrescenta as medições que ainda não existem; para
+substituir as existentes é preciso --substituir.
+
+Uso:
+    python benchmarks/bench_paginas.py                       # compara com a baseline
+    python benchmarks/bench_paginas.py --salvar-baseline     # acrescenta o que falta na baseline
+    python benchmarks/bench_paginas.py --tamanhos 1000 --paginas dashboard
+    python benchmarks/bench_paginas.py --tamanhos 100000     # sem baseline: só mede
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_firebase  # noqa: E402
+
+firebase_utils, db, bucket = fake_firebase.instalar()
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+# Importados antes de medir: a execução fria mede a página, não o import das
+# bibliotecas que todas usam (senão o tempo dependeria da ordem das páginas)
+import numpy  # noqa: E402,F401
+import pandas  # noqa: E402,F401
+
+BASELINE_PADRAO = os.path.join(RAIZ, "benchmarks", "baselines", "paginas.json")
+# Os tamanhos com baseline gravada; 100000 pode ser pedido em --tamanhos
+TAMANHOS_PADRAO = [1_000, 10_000]
+TIPOS_EXAME = ["Admissional", "Periódico", "Demissional", "Mudança de Risco", "Retorno ao Trabalho"]
+RESULTADOS = ["Apto", "Inapto", "Apto com Restrições"]
+ACOES = ["Login Succeeded", "Login Failed", "Logout", "ASO Created", "ASO Edited", "ASO Deleted"]
+TIPOS_WIDGET = ["button", "form_submit_button", "download_button", "link_button", "checkbox", "toggle",
+                "text_input", "text_area", "selectbox", "multiselect", "date_input", "number_input",
+                "radio", "file_uploader"]
+
+
+def _interagir_historico(at):
+    if at.selectbox and at.selectbox[0].options:
+        at.selectbox[0].select(at.selectbox[0].options[0])
+
+
+def _interagir_relatorios(at):
+    at.button[0].click()
+
+
+def _interagir_dashboard(at):
+    botoes = [b for b in at.button if b.key and b.key.startswith("view_")]
+    if botoes:
+        botoes[0].click()
+
+
+PAGINAS = {
+    "dashboard": ("pages/2_📊_Dashboard.py", _interagir_dashboard),
+    "logs": ("pages/5_📜_Logs_de_Atividade.py", None),
+    "historico": ("pages/6_👨‍💼_Histórico_por_Funcionário.py", _interagir_historico),
+    "relatorios": ("pages/7_📄_Relatórios_XLSX.py", _interagir_relatorios),
+}
+
+
+def semear(n, seed=42):
+    """Popula o banco falso com n ASOs (cerca de 3 por funcionário) e n logs."""
+    rng = random.Random(seed)
+    db.limpar()
+    bucket.arquivos.clear()
+    hoje = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    funcionarios = [f"Funcionário {i:06d}" for i in range(max(n // 3, 1))]
+
+    asos = {}
+    for i in range(n):
+        data_exame = hoje - timedelta(days=rng.randint(0, 5 * 365))
+        asos[f"aso{i:08d}"] = {
+            "nome_funcionario": rng.choice(funcionarios),
+            "funcao": rng.choice(["Operador", "Técnico", "Analista", "Motorista"]),
+            "tipo_exame": rng.choice(TIPOS_EXAME),
+            "resultado": rng.choice(RESULTADOS),
+            "data_exame": data_exame,
+            "data_vencimento": hoje + timedelta(days=rng.randint(-400, 400)),
+            "nome_medico": "Dra. Exemplo",
+            "crm_medico": "12345-SP",
+            "anexos": [],
+            "lancado_por": "benchmark@exemplo.com",
+            "data_lancamento": data_exame,
+            "updated_at": data_exame,
+        }
+    db.collection("asos").semear(asos)
+
+    logs = {}
+    for i in range(n):
+        logs[f"log{i:08d}"] = {
+            "user_email": f"usuario{rng.randint(0, 50)}@exemplo.com",
+            "action": rng.choice(ACOES),
+            "details": "",
+            "timestamp": hoje - timedelta(minutes=i),
+        }
+    db.collection("logs").semear(logs)
+
+    # Índices mantidos pelas escritas do app, montados como no deploy
+    from funcionarios_index import reconstruir_indice
+    from estatisticas_dashboard import reconstruir_estatisticas
+    reconstruir_indice()
+    reconstruir_estatisticas(asos.values())
+
+
+def _limpar_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    # "Frio" é sem o snapshot em disco também: espera a gravação em andamento e apaga o arquivo
+    import aso_cache_disco
+    for thread in threading.enumerate():
+        if thread.name == "snapshot-asos-disco":
+            thread.join()
+    if os.path.exists(aso_cache_disco.caminho_snapshot()):
+        os.remove(aso_cache_disco.caminho_snapshot())
+    gc.collect()
+
+
+def _novo_app(script):
+    at = AppTest.from_file(os.path.join(RAIZ, script), default_timeout=900)
+    at.session_state["authentication_status"] = True
+    at.session_state["role"] = "admin"
+    at.session_state["username"] = "benchmark@exemplo.com"
+    at.session_state["uid"] = "benchmark"
+    return at
+
+
+def _contar_widgets(at):
+    return sum(len(getattr(at, tipo)) for tipo in TIPOS_WIDGET)
+
+
+def _verificar(at, nome):
+    if at.exception:
+        raise RuntimeError(f"Página '{nome}' falhou: {at.exception[0].value}")
+
+
+def medir_pagina(nome, n):
+    script, interagir = PAGINAS[nome]
+
+    # Tempo e leituras (sem tracemalloc, que distorce o tempo)
+    _limpar_caches()
+    db.zerar_contadores()
+    at = _novo_app(script)
+    inicio = time.perf_counter()
+    at.run()
+    tempo_frio = time.perf_counter() - inicio
+    _verificar(at, nome)
+    lidos_frio = sum(db.leituras.values())
+
+    db.zerar_contadores()
+    if interagir:
+        interagir(at)
+    inicio = time.perf_counter()
+    at.run()
+    tempo_quente = time.perf_counter() - inicio
+    _verificar(at, nome)
+    lidos_quente = sum(db.leituras.values())
+    widgets = _contar_widgets(at)
+
+    # Pico de memória da execução fria, numa rodada separada
+    _limpar_caches()
+    at = _novo_app(script)
+    tracemalloc.start()
+    at.run()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "tempo_frio_s": round(tempo_frio, 4),
+        "tempo_quente_s": round(tempo_quente, 4),
+        "memoria_pico_mb": round(pico / 1024 / 1024, 2),
+        "documentos_lidos_frio": lidos_frio,
+        "documentos_lidos_quente": lidos_quente,
+        "widgets": widgets,
+    }
+
+
+def comparar(resultados, baseline, tolerancia):
+    """(regressões, medições sem baseline), como listas de texto."""
+    regressoes, sem_baseline = [], []
+    for chave, atual in resultados.items():
+        anterior = baseline.get(chave)
+        if not anterior:
+            sem_baseline.append(chave)
+            continue
+        for metrica in ("tempo_frio_s", "tempo_quente_s", "memoria_pico_mb"):
+            # Tempos abaixo de 50 ms variam demais para comparar
+            if atual[metrica] > anterior[metrica] * (1 + tolerancia) and atual[metrica] - anterior[metrica] > 0.05:
+                regressoes.append(f"{chave} {metrica}: {anterior[metrica]} -> {atual[metrica]}")
+        for metrica in ("documentos_lidos_frio", "documentos_lidos_quente", "widgets"):
+            if atual[metrica] > anterior[metrica]:
+                regressoes.append(f"{chave} {metrica}: {anterior[metrica]} -> {atual[metrica]}")
+    return regressoes, sem_baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--paginas", nargs="+", choices=list(PAGINAS), default=list(PAGINAS))
+    parser.add_argument("--baseline", default=BASELINE_PADRAO)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument("--substituir", action="store_true",
+                        help="com --salvar-baseline, regrava também as medições já existentes")
+    parser.add_argument("--tolerancia", type=float, default=0.5,
+                        help="aumento relativo aceito em tempo e memória (padrão: 0.5 = 50%%)")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)  # as páginas carregam logobd.png por caminho relativo
+    resultados = {}
+    print(f"{'página':<12} {'docs':>8} {'frio (s)':>9} {'quente (s)':>11} {'pico (MB)':>10} "
+          f"{'lidos frio':>11} {'lidos quente':>13} {'widgets':>8}")
+    for n in args.tamanhos:
+        semear(n)
+        for nome in args.paginas:
+            r = medir_pagina(nome, n)
+            resultados[f"{nome}@{n}"] = r
+            print(f"{nome:<12} {n:>8} {r['tempo_frio_s']:>9.3f} {r['tempo_quente_s']:>11.3f} "
+                  f"{r['memoria_pico_mb']:>10.1f} {r['documentos_lidos_frio']:>11} "
+                  f"{r['documentos_lidos_quente']:>13} {r['widgets']:>8}")
+
+    if args.salvar_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        mantidas = [] if args.substituir else [chave for chave in resultados if chave in baseline]
+        baseline.update({chave: r for chave, r in resultados.items() if chave not in mantidas})
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nBaseline gravada em {args.baseline}")
+        if mantidas:
+            print(f"Mantidas as medições já existentes (use --substituir para regravar): {', '.join(mantidas)}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nSem baseline para comparar (use --salvar-baseline).")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressoes, sem_baseline = comparar(resultados, json.load(f), args.tolerancia)
+    if sem_baseline:
+        print(f"\nSem baseline (não comparadas): {', '.join(sem_baseline)}")
+    if regressoes:
+        print("\nRegressões em relação à baseline:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        return 1
+    print("\nSem regressões em relação à baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark da classificação de status: `apply(axis=1)` (implementação
+antiga das páginas) contra `aso_status.classificar_status` (vetorizada).
+
+Uso: python benchmarks/bench_status.py [10000 100000 1000000]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aso_status import classificar_status  # noqa: E402
+
+TIPOS_EXAME = ["Admissional", "Periódico", "Demissional", "Mudança de Risco", "Retorno ao Trabalho"]
+
+
+def gerar_asos(n, seed=42):
+    rng = np.random.default_rng(seed)
+    hoje = datetime.now(timezone.utc)
+    return pd.DataFrame({
+        'tipo_exame': rng.choice(TIPOS_EXAME, size=n),
+        'data_vencimento': pd.to_datetime(hoje) + pd.to_timedelta(rng.integers(-400, 400, size=n), unit='D'),
+    })
+
+
+def classificar_com_apply(df):
+    # Cópia fiel do código que existia nas páginas Dashboard e Relatórios
+    df['data_vencimento'] = pd.to_datetime(df['data_vencimento'])
+    hoje = datetime.now(timezone.utc)
+    df['dias_para_vencer'] = (df['data_vencimento'] - hoje).dt.days
+
+    def definir_status(row):
+        if row.get('tipo_exame') == 'Demissional': return 'Arquivado'
+        dias = row['dias_para_vencer']
+        if dias < 0: return "Vencido"
+        elif dias <= 30: return "Vence em até 30 dias"
+        elif dias <= 60: return "Vence em até 60 dias"
+        else: return "Em dia"
+    df['Status'] = df.apply(definir_status, axis=1)
+    return df
+
+
+def cronometrar(func, df, repeticoes):
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = func(copia)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main(tamanhos):
+    print(f"{'linhas':>10} {'apply (s)':>12} {'vetorizado (s)':>15} {'ganho':>8}")
+    for n in tamanhos:
+        df = gerar_asos(n)
+        # O apply é lento demais para repetir em 1M de linhas
+        t_apply, r_apply = cronometrar(classificar_com_apply, df, 1 if n >= 1_000_000 else 3)
+        t_vet, r_vet = cronometrar(classificar_status, df, 5)
+        if not (r_apply['Status'].to_numpy() == r_vet['Status'].to_numpy()).all():
+            raise AssertionError(f"Resultados divergentes para {n} linhas")
+        print(f"{n:>10} {t_apply:>12.4f} {t_vet:>15.4f} {t_apply / t_vet:>7.1f}x")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    main(tamanhos)
@@ -0,0 +1,460 @@
+"""
+Firestore e Cloud Storage em memória, para benchmarks das páginas.
+
+Implementa só a parte da API usada pelo app (coleções, documentos, consultas
+com where/order_by/limit/start_after/select, batches, get_all e blobs) e conta
+quantos documentos cada coleção devolveu, como o Firestore cobraria.
+"""
+import io
+import itertools
+import operator
+import threading
+import types
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+
+_OPERADORES = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda valor, opcoes: valor in opcoes,
+    'not-in': lambda valor, opcoes: valor not in opcoes,
+    'array_contains': lambda valor, item: isinstance(valor, list) and item in valor,
+    'array_contains_any': lambda valor, itens: isinstance(valor, list) and any(i in valor for i in itens),
+}
+_DESCENDENTE = (firestore.Query.DESCENDING, 'DESCENDING')
+_AUSENTE = object()
+
+
+def _agora():
+    return datetime.now(timezone.utc)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, referencia, dados, update_time=None, campos=None):
+        self.reference = referencia
+        self.id = referencia.id
+        self._dados = dados
+        self.exists = dados is not None
+        self.update_time = update_time
+        self.create_time = update_time
+        if dados is not None and campos is not None:
+            self._dados = {c: dados[c] for c in campos if c in dados}
+
+    def to_dict(self):
+        return None if self._dados is None else dict(self._dados)
+
+    def get(self, campo):
+        return self._dados.get(campo)
+
+
+class FakeDocumentReference:
+    def __init__(self, colecao, doc_id):
+        self._colecao = colecao
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._colecao.id}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None):
+        self._colecao.banco.contar_leitura(self._colecao.id)
+        dados, update_time = self._colecao.ler(self.id)
+        return FakeDocumentSnapshot(self, dados, update_time, field_paths)
+
+    def set(self, dados, merge=False):
+        return self._colecao.gravar(self.id, dados, mesclar=merge)
+
+    def create(self, dados):
+        if self._colecao.ler(self.id)[0] is not None:
+            raise ValueError(f"Documento {self.path} já existe")
+        return self._colecao.gravar(self.id, dados)
+
+    def update(self, dados, option=None):
+        if self._colecao.ler(self.id)[0] is None:
+            raise ValueError(f"Documento {self.path} não existe")
+        return self._colecao.gravar(self.id, dados, mesclar=True)
+
+    def delete(self, option=None):
+        self._colecao.remover(self.id)
+        return types.SimpleNamespace(update_time=_agora())
+
+    def collection(self, nome):
+        return self._colecao.banco.collection(f"{self.path}/{nome}")
+
+
+class FakeQuery:
+    def __init__(self, colecao, filtros=(), ordem=(), limite=None, cursor=None, campos=None):
+        self._colecao = colecao
+        self._filtros = filtros
+        self._ordem = ordem
+        self._limite = limite
+        self._cursor = cursor
+        self._campos = campos
+
+    def _copiar(self, **mudancas):
+        atributos = dict(filtros=self._filtros, ordem=self._ordem, limite=self._limite,
+                         cursor=self._cursor, campos=self._campos)
+        atributos.update(mudancas)
+        return FakeQuery(self._colecao, **atributos)
+
+    def where(self, campo=None, op=None, valor=None, filter=None):
+        if filter is not None:
+            campo, op, valor = filter.field_path, filter.op_string, filter.value
+        return self._copiar(filtros=self._filtros + ((campo, op, valor),))
+
+    def order_by(self, campo, direction=firestore.Query.ASCENDING):
+        return self._copiar(ordem=self._ordem + ((campo, direction in _DESCENDENTE),))
+
+    def limit(self, n):
+        return self._copiar(limite=n)
+
+    def start_after(self, cursor):
+        return self._copiar(cursor=cursor)
+
+    def select(self, campos):
+        return self._copiar(campos=list(campos))
+
+    def _valor(self, doc_id, dados, campo):
+        return doc_id if campo == '__name__' else dados.get(campo, _AUSENTE)
+
+    def _chave_ordem(self, ordem):
+        def chave(item):
+            doc_id, dados = item
+            return tuple(self._valor(doc_id, dados, campo) for campo, _ in ordem)
+        return chave
+
+    def stream(self, transaction=None):
+        itens = self._colecao.itens()
+        for campo, op, valor in self._filtros:
+            comparar = _OPERADORES[op]
+            itens = [(i, d) for i, d in itens
+                     if campo in d and d[campo] is not None and comparar(d[campo], valor)]
+
+        # Como no Firestore: campos ordenados precisam existir e o id desempata
+        ordem = list(self._ordem)
+        if not any(campo == '__name__' for campo, _ in ordem):
+            ordem.append(('__name__', ordem[-1][1] if ordem else False))
+        itens = [(i, d) for i, d in itens if all(c == '__name__' or c in d for c, _ in ordem)]
+        for campo, descendente in reversed(ordem):
+            itens.sort(key=lambda item, c=campo: self._valor(item[0], item[1], c), reverse=descendente)
+
+        if self._cursor is not None:
+            if isinstance(self._cursor, dict):
+                referencia = tuple(self._cursor.get(c) for c, _ in ordem)
+            else:
+                dados_cursor = self._colecao.ler(self._cursor.id)[0] or self._cursor.to_dict()
+                referencia = tuple(self._valor(self._cursor.id, dados_cursor, c) for c, _ in ordem)
+            posicao = 0
+            for posicao, item in enumerate(itens):
+                atual = self._chave_ordem(ordem)(item)
+                if self._depois(atual, referencia, ordem):
+                    break
+            else:
+                posicao = len(itens)
+            itens = itens[posicao:]
+
+        if self._limite is not None:
+            itens = itens[:self._limite]
+        # O Firestore cobra ao menos uma leitura por consulta
+        self._colecao.banco.contar_leitura(self._colecao.id, max(len(itens), 1))
+        for doc_id, dados in itens:
+            referencia_doc = FakeDocumentReference(self._colecao, doc_id)
+            yield FakeDocumentSnapshot(referencia_doc, dados, self._colecao.update_time(doc_id), self._campos)
+
+    @staticmethod
+    def _depois(atual, referencia, ordem):
+        for valor, ref, (_, descendente) in zip(atual, referencia, ordem):
+            if valor == ref:
+                continue
+            return valor < ref if descendente else valor > ref
+        return False
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, banco, nome):
+        self.banco = banco
+        self.id = nome
+        self._documentos = {}
+        self._update_times = {}
+        self._lock = threading.Lock()
+        super().__init__(self)
+
+    # --- Armazenamento ---
+
+    def itens(self):
+        with self._lock:
+            return list(self._documentos.items())
+
+    def ler(self, doc_id):
+        with self._lock:
+            return self._documentos.get(doc_id), self._update_times.get(doc_id)
+
+    def update_time(self, doc_id):
+        return self._update_times.get(doc_id)
+
+    def gravar(self, doc_id, dados, mesclar=False):
+        agora = _agora()
+        with self._lock:
+            atual = dict(self._documentos.get(doc_id) or {}) if mesclar else {}
+            _aplicar_campos(atual, dados, agora)
+            self._documentos[doc_id] = atual
+            self._update_times[doc_id] = agora
+        self.banco.contar_escrita(self.id)
+        return types.SimpleNamespace(update_time=agora)
+
+    def remover(self, doc_id):
+        with self._lock:
+            self._documentos.pop(doc_id, None)
+            self._update_times.pop(doc_id, None)
+        self.banco.contar_escrita(self.id)
+
+    def semear(self, documentos):
+        """Carrega documentos {id: dados} sem contar escritas."""
+        agora = _agora()
+        with self._lock:
+            for doc_id, dados in documentos.items():
+                self._documentos[doc_id] = dados
+                self._update_times[doc_id] = agora
+
+    # --- API do Firestore ---
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or self.banco.novo_id())
+
+    def add(self, dados, document_id=None):
+        referencia = self.document(document_id)
+        resultado = referencia.set(dados)
+        return resultado.update_time, referencia
+
+    def list_documents(self):
+        return [FakeDocumentReference(self, doc_id) for doc_id, _ in self.itens()]
+
+
+def _aplicar_campos(destino, dados, agora):
+    for campo, valor in dados.items():
+        if isinstance(valor, dict):
+            interno = destino.get(campo) if isinstance(destino.get(campo), dict) else {}
+            destino[campo] = _aplicar_campos(dict(interno), valor, agora)
+        elif valor is firestore.SERVER_TIMESTAMP:
+            destino[campo] = agora
+        elif valor is firestore.DELETE_FIELD:
+            destino.pop(campo, None)
+        elif isinstance(valor, firestore.Increment):
+            destino[campo] = destino.get(campo, 0) + valor.value
+        elif isinstance(valor, firestore.ArrayUnion):
+            atual = list(destino.get(campo) or [])
+            destino[campo] = atual + [v for v in valor.values if v not in atual]
+        elif isinstance(valor, datetime) and valor.tzinfo is None:
+            # Como no Firestore, datas sem fuso são gravadas como UTC e lidas com fuso
+            destino[campo] = valor.replace(tzinfo=timezone.utc)
+        else:
+            destino[campo] = valor
+    return destino
+
+
+class FakeWriteBatch:
+    def __init__(self):
+        self._operacoes = []
+
+    def __len__(self):
+        return len(self._operacoes)
+
+    def set(self, referencia, dados, merge=False):
+        self._operacoes.append(lambda: referencia.set(dados, merge=merge))
+
+    def create(self, referencia, dados):
+        self._operacoes.append(lambda: referencia.create(dados))
+
+    def update(self, referencia, dados, option=None):
+        self._operacoes.append(lambda: referencia.update(dados, option=option))
+
+    def delete(self, referencia, option=None):
+        self._operacoes.append(lambda: referencia.delete())
+
+    def commit(self):
+        if len(self._operacoes) > 500:
+            raise ValueError("Um batch aceita no máximo 500 escritas")
+        resultados = [operacao() for operacao in self._operacoes]
+        self._operacoes = []
+        return resultados
+
+
+class FakeFirestore:
+    def __init__(self):
+        self._colecoes = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.leituras = defaultdict(int)
+        self.escritas = defaultdict(int)
+
+    def novo_id(self):
+        return f"doc{next(self._ids):012d}"
+
+    def contar_leitura(self, colecao, n=1):
+        with self._lock:
+            self.leituras[colecao] += n
+
+    def contar_escrita(self, colecao, n=1):
+        with self._lock:
+            self.escritas[colecao] += n
+
+    def zerar_contadores(self):
+        self.leituras.clear()
+        self.escritas.clear()
+
+    def limpar(self):
+        self._colecoes.clear()
+        self.zerar_contadores()
+
+    def collection(self, nome):
+        with self._lock:
+            if nome not in self._colecoes:
+                self._colecoes[nome] = FakeCollection(self, nome)
+            return self._colecoes[nome]
+
+    def batch(self):
+        return FakeWriteBatch()
+
+    def get_all(self, referencias, field_paths=None, transaction=None):
+        for referencia in referencias:
+            yield referencia.get(field_paths)
+
+    def write_option(self, **kwargs):
+        return kwargs
+
+
+class FakeBlob:
+    def __init__(self, bucket, nome):
+        self.bucket = bucket
+        self.name = nome
+        self.chunk_size = None
+        self.content_type = None
+
+    @property
+    def size(self):
+        conteudo = self.bucket.arquivos.get(self.name)
+        return None if conteudo is None else len(conteudo)
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    @property
+    def time_created(self):
+        return self.bucket.criados.get(self.name)
+
+    def upload_from_string(self, dados, content_type=None):
+        self.bucket.arquivos[self.name] = dados if isinstance(dados, bytes) else dados.encode()
+        self.bucket.criados[self.name] = _agora()
+        self.content_type = content_type
+
+    def upload_from_file(self, arquivo, content_type=None, size=None, rewind=False, **kwargs):
+        if rewind:
+            arquivo.seek(0)
+        self.upload_from_string(arquivo.read(), content_type)
+
+    def download_as_bytes(self):
+        return self.bucket.arquivos[self.name]
+
+    def open(self, mode="rb"):
+        return io.BytesIO(self.bucket.arquivos[self.name])
+
+    def exists(self):
+        return self.name in self.bucket.arquivos
+
+    def make_public(self):
+        pass
+
+    def delete(self):
+        lote = self.bucket.client.lote_atual
+        if lote is None:
+            self.bucket.client.requisicoes += 1
+        else:
+            lote.chamadas += 1
+        self.bucket.criados.pop(self.name, None)
+        if self.bucket.arquivos.pop(self.name, None) is None:
+            if lote is None or lote.raise_exception:
+                raise FileNotFoundError(self.name)
+
+    def generate_signed_url(self, **kwargs):
+        return f"{self.public_url}?X-Goog-Signature=fake"
+
+
+class FakeBatch:
+    def __init__(self, cliente, raise_exception):
+        self.cliente = cliente
+        self.raise_exception = raise_exception
+        self.chamadas = 0
+
+    def __enter__(self):
+        self.cliente.lote_atual = self
+        return self
+
+    def __exit__(self, *exc):
+        self.cliente.lote_atual = None
+        # Uma requisição HTTP por lote, com até 100 chamadas
+        if self.chamadas > 100:
+            raise ValueError("Um batch do Storage aceita no máximo 100 chamadas")
+        self.cliente.requisicoes += 1 if self.chamadas else 0
+        return False
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.lote_atual = None
+        self.requisicoes = 0
+
+    def batch(self, raise_exception=True):
+        return FakeBatch(self, raise_exception)
+
+
+class FakeBucket:
+    def __init__(self, nome="bucket-benchmark"):
+        self.name = nome
+        self.arquivos = {}
+        self.criados = {}
+        self.client = FakeStorageClient()
+
+    def blob(self, nome):
+        return FakeBlob(self, nome)
+
+    def get_blob(self, nome):
+        return FakeBlob(self, nome) if nome in self.arquivos else None
+
+    def list_blobs(self, prefix="", page_size=None, **kwargs):
+        return [FakeBlob(self, nome) for nome in sorted(self.arquivos) if nome.startswith(prefix)]
+
+    def delete_blobs(self, blobs, on_error=None):
+        for blob in blobs:
+            try:
+                blob.delete()
+            except FileNotFoundError:
+                if on_error is None:
+                    raise
+                on_error(blob)
+
+
+def instalar(db=None, bucket=None):
+    """
+    Importa `firebase_utils` com os clientes trocados pelos falsos (sem tocar
+    no Firebase de verdade) e devolve (modulo, db, bucket). Deve ser chamado
+    antes de importar qualquer página ou módulo que use `firebase_utils`.
+    """
+    db = db or FakeFirestore()
+    bucket = bucket or FakeBucket()
+    import firebase_utils
+    # Os clientes são criados sob demanda pelos acessores; basta trocá-los
+    app = object()
+    firebase_utils.obter_app = lambda: app
+    firebase_utils.obter_db = lambda: db
+    firebase_utils.obter_bucket = lambda: bucket
+    return firebase_utils, db, bucket
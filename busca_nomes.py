@@ -0,0 +1,89 @@
+import bisect
+import unicodedata
+
+import streamlit as st
+
+# --- Busca de nomes sem acento ---
+# Índice em memória dos nomes de funcionários, normalizados (sem acentos, sem
+# diferença de maiúsculas), para que "joao" encontre "João". Termos com 3
+# letras ou mais usam listas de trigramas sobre as palavras dos nomes: basta
+# percorrer a menor lista dos trigramas do termo e confirmar cada palavra.
+# Termos curtos procuram palavras que começam com o texto digitado (bisect).
+# Várias palavras na consulta precisam aparecer todas no nome, em qualquer ordem.
+
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNomes:
+    def __init__(self, nomes):
+        self.nomes = sorted(set(n for n in nomes if n))
+        # Nomes repetem muito as mesmas palavras: o índice é montado sobre o
+        # vocabulário (palavra normalizada -> ids dos nomes) e cada palavra
+        # original é normalizada uma vez só.
+        normalizadas = {}
+        postagens = {}
+        for i, nome in enumerate(self.nomes):
+            for palavra in nome.split():
+                normalizada = normalizadas.get(palavra)
+                if normalizada is None:
+                    normalizada = normalizadas[palavra] = normalizar(palavra)
+                postagens.setdefault(normalizada, []).append(i)
+        self._postagens = postagens
+        self._vocabulario = sorted(postagens)
+        self._trigramas = {}
+        for palavra in self._vocabulario:
+            for trigrama in _trigramas(palavra):
+                self._trigramas.setdefault(trigrama, []).append(palavra)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def _palavras(self, termo):
+        if len(termo) < 3:
+            inicio = bisect.bisect_left(self._vocabulario, termo)
+            fim = bisect.bisect_left(self._vocabulario, termo + "\uffff")
+            return self._vocabulario[inicio:fim]
+        # Um termo sem espaços está contido no nome se estiver contido em alguma palavra dele
+        menor = min((self._trigramas.get(t, []) for t in _trigramas(termo)), key=len)
+        return [palavra for palavra in menor if termo in palavra]
+
+    def _ids(self, termo):
+        ids = set()
+        for palavra in self._palavras(termo):
+            ids.update(self._postagens[palavra])
+        return ids
+
+    def buscar(self, consulta, limite=None):
+        """Nomes originais que batem com a consulta, em ordem alfabética."""
+        termos = normalizar(consulta).split()
+        if not termos:
+            return self.nomes[:limite] if limite else list(self.nomes)
+        candidatos = None
+        # Termos mais longos primeiro: costumam casar com menos nomes
+        for termo in sorted(termos, key=len, reverse=True):
+            ids = self._ids(termo)
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                return []
+        encontrados = [self.nomes[i] for i in sorted(candidatos)]
+        return encontrados[:limite] if limite else encontrados
+
+
+@st.cache_resource(max_entries=4)
+def _indice_cacheado(chave, _nomes):
+    # `_nomes` fica fora do hash do Streamlit; a chave já identifica a lista
+    return IndiceNomes(_nomes)
+
+
+def indice_nomes(nomes):
+    """Índice para a lista de nomes, reaproveitado enquanto a lista não mudar."""
+    nomes = tuple(nomes)
+    return _indice_cacheado((len(nomes), hash(nomes)), nomes)
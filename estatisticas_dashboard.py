@@ -0,0 +1,125 @@
+import sys
+
+import streamlit as st
+from firebase_utils import obter_db, firestore
+
+# --- Documento agregado do Dashboard ---
+# `estatisticas/dashboard` guarda as contagens sobre todos os exames:
+#   total e por_tipo {tipo: n}
+# Os alertas e o gráfico mensal consideram só o ASO atual de cada funcionário e
+# saem da visão mantida pelo snapshot (aso_sync.py), que depende da data de hoje;
+# por isso o documento não guarda contagens por status nem por vencimento.
+# Cada criação/edição/exclusão de ASO soma incrementos neste documento no
+# mesmo batch da escrita do ASO.
+# Só a reconstrução marca o documento como `inicializado`: sem a marca ele é
+# tratado como inexistente (o Dashboard reconstrói) e as escritas não somam
+# incrementos nele, que seriam só a diferença e não o total.
+# Reconstrução a partir dos dados existentes:
+#     python estatisticas_dashboard.py --rebuild
+
+COLECAO_ESTATISTICAS = "estatisticas"
+DOCUMENTO_DASHBOARD = "dashboard"
+CAMPO_INICIALIZADO = "inicializado"
+
+
+def referencia_estatisticas():
+    return obter_db().collection(COLECAO_ESTATISTICAS).document(DOCUMENTO_DASHBOARD)
+
+
+def _somar(destino, origem):
+    for chave, valor in origem.items():
+        if isinstance(valor, dict):
+            _somar(destino.setdefault(chave, {}), valor)
+        else:
+            destino[chave] = destino.get(chave, 0) + valor
+    return destino
+
+
+def contribuicao(aso, sinal):
+    """Contagens (com sinal +1/-1) que um ASO representa no documento agregado."""
+    resultado = {'total': sinal}
+    tipo = aso.get('tipo_exame')
+    if tipo:
+        resultado['por_tipo'] = {tipo: sinal}
+    return resultado
+
+
+def _como_incrementos(contagens):
+    incrementos = {}
+    for chave, valor in contagens.items():
+        if isinstance(valor, dict):
+            interno = _como_incrementos(valor)
+            if interno:
+                incrementos[chave] = interno
+        elif valor:
+            incrementos[chave] = firestore.Increment(valor)
+    return incrementos
+
+
+def _estatisticas_inicializadas():
+    if carregar_estatisticas() is not None:
+        return True
+    # Outro processo pode ter reconstruído no último minuto: confere de novo
+    carregar_estatisticas.clear()
+    return carregar_estatisticas() is not None
+
+
+def adicionar_incrementos(batch, antes=None, depois=None):
+    """
+    Adiciona ao batch a atualização do documento agregado para a troca de
+    `antes` por `depois` (None em criações e exclusões, respectivamente).
+    Não faz nada enquanto o documento não tiver sido reconstruído.
+    """
+    contagens = {}
+    if antes:
+        _somar(contagens, contribuicao(antes, -1))
+    if depois:
+        _somar(contagens, contribuicao(depois, +1))
+    incrementos = _como_incrementos(contagens)
+    if incrementos and _estatisticas_inicializadas():
+        batch.set(referencia_estatisticas(), incrementos, merge=True)
+
+
+def adicionar_incrementos_criacao(batch, asos):
+    """Como adicionar_incrementos, para vários ASOs novos numa única escrita do documento agregado."""
+    contagens = {}
+    for aso in asos:
+        _somar(contagens, contribuicao(aso, +1))
+    incrementos = _como_incrementos(contagens)
+    if incrementos and _estatisticas_inicializadas():
+        batch.set(referencia_estatisticas(), incrementos, merge=True)
+
+
+@st.cache_data(ttl=60)
+def carregar_estatisticas():
+    """
+    Documento agregado (dict) ou None se ainda não existir ou nunca tiver sido
+    reconstruído. Uma leitura por minuto, no máximo.
+    """
+    snapshot = referencia_estatisticas().get()
+    dados = snapshot.to_dict() if snapshot.exists else None
+    if not dados or not dados.get(CAMPO_INICIALIZADO):
+        return None
+    return dados
+
+
+def reconstruir_estatisticas(documentos=None):
+    """Recalcula o documento agregado inteiro. Sem `documentos`, lê a coleção `asos`."""
+    if documentos is None:
+        documentos = (doc.to_dict() for doc in obter_db().collection("asos").select(['tipo_exame']).stream())
+    contagens = {'total': 0, 'por_tipo': {}}
+    for aso in documentos:
+        _somar(contagens, contribuicao(aso, +1))
+    contagens[CAMPO_INICIALIZADO] = True
+    referencia_estatisticas().set(contagens)
+    carregar_estatisticas.clear()
+    return contagens
+
+
+if __name__ == "__main__":
+    if "--rebuild" not in sys.argv:
+        print("Uso: python estatisticas_dashboard.py --rebuild")
+        sys.exit(1)
+    print("--- Reconstruindo as estatísticas do Dashboard ---")
+    contagens = reconstruir_estatisticas()
+    print(f"✅ Estatísticas reconstruídas a partir de {contagens['total']} ASOs.")
@@ -1,6 +1,12 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
 import streamlit as st
 import firebase_admin
-from firebase_admin import credentials, firestore, storage, auth
+from firebase_admin import credentials
 
 # Esta função garante que o Firebase seja inicializado apenas uma vez.
 def initialize_firebase():
@@ -10,7 +16,7 @@ def initialize_firebase():
     """
     try:
         # Verifica se o app já foi inicializado para evitar erros
-        firebase_admin.get_app()
+        return firebase_admin.get_app()
     except ValueError:
         try:
             # **A CORREÇÃO ESTÁ AQUI**
@@ -24,7 +30,7 @@ def initialize_firebase():
 
             cred = credentials.Certificate(firebase_creds_dict)
             
-            firebase_admin.initialize_app(cred, {
+            return firebase_admin.initialize_app(cred, {
                 'storageBucket': firebase_creds_dict.get("storage_bucket_url")
             })
         except Exception as e:
@@ -33,23 +39,150 @@ def initialize_firebase():
             st.info("Verifique se a formatação do seu arquivo .streamlit/secrets.toml está correta, especialmente a 'private_key' com aspas triplas.")
             st.stop()
 
-# Inicializa o app ao carregar o módulo
-initialize_firebase()
+# --- Clientes sob demanda ---
+# Nada é inicializado ao importar este módulo: o app, o cliente do Firestore
+# (canal gRPC) e o do Storage só são criados na primeira vez em que alguma
+# página precisa deles, e ficam compartilhados pelo processo. Assim o Login,
+# que só usa log_activity, não paga pela criação do Storage, por exemplo.
+
+@st.cache_resource
+def obter_app():
+    return initialize_firebase()
+
+
+@st.cache_resource
+def obter_db():
+    from firebase_admin import firestore
+    return firestore.client(obter_app())
+
+
+@st.cache_resource
+def obter_bucket():
+    from firebase_admin import storage
+    return storage.bucket(app=obter_app())
+
+
+def __getattr__(nome):
+    # `from firebase_utils import firestore` continua funcionando sem importar
+    # o SDK do Firestore junto com este módulo; `db` e `bucket` ficam como
+    # atalhos para código antigo (criam o cliente no primeiro acesso).
+    if nome == "firestore":
+        from firebase_admin import firestore
+        return firestore
+    if nome == "db":
+        return obter_db()
+    if nome == "bucket":
+        return obter_bucket()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+# --- Gravação assíncrona dos logs de atividade ---
+# log_activity só coloca o registro numa fila em memória; uma thread de fundo
+# grava os registros em WriteBatches de até 500 documentos, quando o lote enche
+# ou quando INTERVALO_FLUSH_LOGS segundos se passam. A interface nunca espera
+# pela gravação do log. A thread só é criada no primeiro log, não ao importar
+# este módulo.
+TAMANHO_FILA_LOGS = 10000
+TAMANHO_LOTE_LOGS = 500
+INTERVALO_FLUSH_LOGS = 2.0
+MAX_TENTATIVAS_LOGS = 3
+
+
+class _GravadorLogs:
+    def __init__(self):
+        self.fila = queue.Queue(maxsize=TAMANHO_FILA_LOGS)
+        self.estatisticas = {"enfileirados": 0, "gravados": 0, "descartados": 0, "retentativas": 0}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executar, name="gravador-logs", daemon=True)
+            self._thread.start()
+        atexit.register(self.encerrar)
+
+    def _contar(self, chave, n=1):
+        with self._lock:
+            self.estatisticas[chave] += n
+
+    def enfileirar(self, log_data):
+        if self._thread is None:
+            self._iniciar()
+        try:
+            self.fila.put_nowait(log_data)
+            self._contar("enfileirados")
+        except queue.Full:
+            # Melhor perder um log do que travar a interface
+            self._contar("descartados")
+
+    def _gravar(self, lote):
+        for tentativa in range(MAX_TENTATIVAS_LOGS):
+            try:
+                db = obter_db()
+                batch = db.batch()
+                for log_data in lote:
+                    batch.set(db.collection("logs").document(), log_data)
+                batch.commit()
+                self._contar("gravados", len(lote))
+                return
+            except Exception as e:
+                print(f"Erro ao registrar logs (tentativa {tentativa + 1}): {e}")
+                if tentativa + 1 < MAX_TENTATIVAS_LOGS:
+                    self._contar("retentativas")
+                    time.sleep(0.5 * 2 ** tentativa)
+        self._contar("descartados", len(lote))
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            lote = []
+            limite = time.monotonic() + INTERVALO_FLUSH_LOGS
+            while len(lote) < TAMANHO_LOTE_LOGS:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self.fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:  # sinal de encerramento
+                    encerrar = True
+                    break
+                lote.append(item)
+            if lote:
+                self._gravar(lote)
+
+    def encerrar(self, timeout=10):
+        """Grava o que ainda está na fila e para a thread (chamado na saída do processo)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self.fila.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+_gravador_logs = _GravadorLogs()
+
+
+def estatisticas_logs():
+    """Contadores do gravador de logs: enfileirados, gravados, descartados e retentativas."""
+    with _gravador_logs._lock:
+        return dict(_gravador_logs.estatisticas, pendentes=_gravador_logs.fila.qsize())
 
-# Referências para os serviços que serão usados em outras páginas
-db = firestore.client()
-bucket = storage.bucket()
 
-# Função de log (permanece a mesma)
 def log_activity(user_email, action, details=""):
     try:
         log_data = {
             "user_email": user_email,
             "action": action,
             "details": details,
-            "timestamp": firestore.SERVER_TIMESTAMP
+            # Hora do evento, não da gravação do lote, para manter a ordem das ações
+            "timestamp": datetime.now(timezone.utc)
         }
-        db.collection("logs").add(log_data)
+        _gravador_logs.enfileirar(log_data)
     except Exception as e:
         # Evita que um erro de log quebre a aplicação inteira
         print(f"Erro ao registrar log: {e}")
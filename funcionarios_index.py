@@ -0,0 +1,107 @@
+import hashlib
+import sys
+from collections import defaultdict
+
+import streamlit as st
+from firebase_utils import obter_db, firestore
+
+# --- Índice de funcionários ---
+# Coleção `funcionarios` com um documento por funcionário (nome, quantidade de
+# ASOs e data do último exame), para que a página de Histórico não precise
+# varrer a coleção `asos` inteira só para montar a lista de nomes.
+# Reconstrução a partir dos dados existentes:
+#     python funcionarios_index.py --rebuild
+
+COLECAO_FUNCIONARIOS = "funcionarios"
+TAMANHO_LOTE = 500
+
+
+def id_funcionario(nome):
+    # Nomes podem conter "/" e outros caracteres inválidos em ids do Firestore
+    return hashlib.sha1(nome.encode("utf-8")).hexdigest()
+
+
+def _resumo(nome, datas_exame):
+    datas = [d for d in datas_exame if d is not None]
+    return {
+        "nome_funcionario": nome,
+        "total_asos": len(datas_exame),
+        "ultimo_exame": max(datas) if datas else None,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    }
+
+
+def atualizar_funcionarios(nomes):
+    """
+    Recalcula a entrada do índice de cada nome a partir dos ASOs do próprio
+    funcionário. Chamar depois de criar, editar ou excluir um ASO, passando o
+    nome antigo e o novo quando o nome mudar.
+    """
+    db = obter_db()
+    for nome in {n for n in nomes if n}:
+        docs = (db.collection("asos")
+                .where("nome_funcionario", "==", nome)
+                .select(["data_exame"])
+                .stream())
+        datas = [doc.to_dict().get("data_exame") for doc in docs]
+        ref = db.collection(COLECAO_FUNCIONARIOS).document(id_funcionario(nome))
+        if datas:
+            ref.set(_resumo(nome, datas))
+        else:
+            ref.delete()
+    carregar_nomes_funcionarios.clear()
+
+
+@st.cache_data(ttl=60)
+def carregar_nomes_funcionarios():
+    docs = (obter_db().collection(COLECAO_FUNCIONARIOS)
+            .order_by("nome_funcionario")
+            .select(["nome_funcionario"])
+            .stream())
+    return [doc.to_dict()["nome_funcionario"] for doc in docs]
+
+
+def reconstruir_indice():
+    """Reconstrói o índice inteiro a partir da coleção `asos`. Devolve o total de funcionários."""
+    db = obter_db()
+    datas_por_nome = defaultdict(list)
+    for doc in db.collection("asos").select(["nome_funcionario", "data_exame"]).stream():
+        data = doc.to_dict()
+        nome = data.get("nome_funcionario")
+        if nome:
+            datas_por_nome[nome].append(data.get("data_exame"))
+
+    ids_validos = set()
+    batch = db.batch()
+    pendentes = 0
+    for nome, datas in datas_por_nome.items():
+        doc_id = id_funcionario(nome)
+        ids_validos.add(doc_id)
+        batch.set(db.collection(COLECAO_FUNCIONARIOS).document(doc_id), _resumo(nome, datas))
+        pendentes += 1
+        if pendentes == TAMANHO_LOTE:
+            batch.commit()
+            batch = db.batch()
+            pendentes = 0
+
+    # Remove entradas de funcionários que não têm mais nenhum ASO
+    for doc in db.collection(COLECAO_FUNCIONARIOS).select([]).stream():
+        if doc.id not in ids_validos:
+            batch.delete(doc.reference)
+            pendentes += 1
+            if pendentes == TAMANHO_LOTE:
+                batch.commit()
+                batch = db.batch()
+                pendentes = 0
+    if pendentes:
+        batch.commit()
+    return len(ids_validos)
+
+
+if __name__ == "__main__":
+    if "--rebuild" not in sys.argv:
+        print("Uso: python funcionarios_index.py --rebuild")
+        sys.exit(1)
+    print("--- Reconstruindo o índice de funcionários ---")
+    total = reconstruir_indice()
+    print(f"✅ Índice reconstruído com {total} funcionários.")
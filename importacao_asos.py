@@ -0,0 +1,310 @@
+import hashlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from openpyxl import load_workbook
+from firebase_utils import obter_db, firestore
+from aso_sync import COLECAO_ASOS, campos_de_atualizacao
+from estatisticas_dashboard import adicionar_incrementos_criacao, carregar_estatisticas
+from funcionarios_index import COLECAO_FUNCIONARIOS, id_funcionario, carregar_nomes_funcionarios
+from relatorio_xlsx import COLUNAS_EXPORTAR
+
+# --- Importação de ASOs em massa (CSV/XLSX) ---
+# O arquivo é lido em blocos e validado de forma vetorizada (datas, tipo de
+# exame, resultado). As linhas aceitas são gravadas em WriteBatches de até 500
+# escritas, enviados em paralelo. Cada batch leva, além dos ASOs, os
+# incrementos das estatísticas do Dashboard, as entradas do índice de
+# funcionários e a marcação do próprio lote no documento de progresso da
+# importação: ou tudo do lote é gravado, ou nada.
+# Retomada: o id da importação é o hash do arquivo e os ids dos ASOs são
+# derivados dele, então reenviar o mesmo arquivo depois de uma interrupção
+# pula os lotes já gravados e não duplica nada.
+
+COLECAO_IMPORTACOES = "importacoes"
+TIPOS_EXAME = ["Admissional", "Periódico", "Demissional", "Mudança de Risco", "Retorno ao Trabalho"]
+RESULTADOS = ["Apto", "Inapto", "Apto com Restrições"]
+CAMPOS_OBRIGATORIOS = ["nome_funcionario", "tipo_exame", "resultado", "data_exame", "data_vencimento"]
+CAMPOS_OPCIONAIS = ["funcao", "nome_medico", "crm_medico"]
+CAMPOS = CAMPOS_OBRIGATORIOS + CAMPOS_OPCIONAIS
+# Cabeçalhos aceitos além dos nomes dos campos: os do relatório XLSX exportado
+ROTULOS = {**{rotulo.lower(): campo for campo, rotulo in COLUNAS_EXPORTAR.items()},
+           "nome do médico": "nome_medico", "crm do médico": "crm_medico"}
+
+LIMITE_ESCRITAS_BATCH = 500
+LINHAS_POR_BLOCO = 5000
+MAX_BATCHES_SIMULTANEOS = 4
+MAX_TENTATIVAS = 3
+
+
+def id_importacao(conteudo):
+    return hashlib.sha1(conteudo).hexdigest()
+
+
+def _normalizar_colunas(df):
+    colunas = {}
+    for coluna in df.columns:
+        chave = str(coluna).strip().lower()
+        colunas[coluna] = ROTULOS.get(chave, chave)
+    return df.rename(columns=colunas)
+
+
+def _blocos_csv(conteudo):
+    # sep=None detecta "," ou ";" (planilhas brasileiras costumam exportar com ";")
+    leitor = pd.read_csv(io.BytesIO(conteudo), sep=None, engine="python", dtype=str,
+                         encoding="utf-8-sig", chunksize=LINHAS_POR_BLOCO, keep_default_na=False)
+    for bloco in leitor:
+        yield bloco
+
+
+def _blocos_xlsx(conteudo):
+    planilha = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True).active
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == LINHAS_POR_BLOCO:
+            yield pd.DataFrame(bloco, columns=cabecalho)
+            bloco = []
+    if bloco:
+        yield pd.DataFrame(bloco, columns=cabecalho)
+
+
+def _converter_datas(serie):
+    # Aceita AAAA-MM-DD (e datas vindas do Excel, que viram "AAAA-MM-DD 00:00:00") e DD/MM/AAAA
+    texto = serie.fillna("").astype(str).str.strip()
+    iso = pd.to_datetime(texto.str[:10], format="%Y-%m-%d", errors="coerce")
+    brasileiro = pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce")
+    return iso.fillna(brasileiro)
+
+
+def _canonizar(serie, opcoes):
+    por_minusculo = {opcao.lower(): opcao for opcao in opcoes}
+    return serie.fillna("").astype(str).str.strip().str.lower().map(por_minusculo)
+
+
+def validar_bloco(bloco, primeira_linha):
+    """
+    Valida um bloco (DataFrame com os cabeçalhos do arquivo). Devolve
+    (aceitas, rejeitadas): `aceitas` com os campos do ASO já convertidos e a
+    coluna `linha`; `rejeitadas` com as colunas originais, `Linha` e `Erro`.
+    """
+    original = bloco.reset_index(drop=True)
+    df = _normalizar_colunas(original).reindex(columns=CAMPOS)
+    df['linha'] = range(primeira_linha, primeira_linha + len(df))
+
+    for campo in ["nome_funcionario"] + CAMPOS_OPCIONAIS:
+        df[campo] = df[campo].fillna("").astype(str).str.strip()
+    df['tipo_exame'] = _canonizar(df['tipo_exame'], TIPOS_EXAME)
+    df['resultado'] = _canonizar(df['resultado'], RESULTADOS)
+    df['data_exame'] = _converter_datas(df['data_exame'])
+    df['data_vencimento'] = _converter_datas(df['data_vencimento'])
+
+    erros = pd.Series("", index=df.index)
+    checagens = [
+        (df['nome_funcionario'] == "", "nome do funcionário vazio"),
+        (df['tipo_exame'].isna(), "tipo de exame inválido"),
+        (df['resultado'].isna(), "resultado inválido"),
+        (df['data_exame'].isna(), "data do exame inválida"),
+        (df['data_vencimento'].isna(), "data de vencimento inválida"),
+        (df['data_vencimento'] < df['data_exame'], "vencimento anterior ao exame"),
+    ]
+    for mascara, mensagem in checagens:
+        erros = erros.mask(mascara, erros + mensagem + "; ")
+
+    invalidas = erros != ""
+    rejeitadas = original[invalidas.values].copy()
+    rejeitadas.insert(0, 'Linha', df.loc[invalidas, 'linha'].values)
+    rejeitadas['Erro'] = erros[invalidas].str.rstrip("; ").values
+    return df[~invalidas], rejeitadas
+
+
+def ler_e_validar(conteudo, nome_arquivo):
+    """Lê o arquivo em blocos e devolve (aceitas, rejeitadas) para o arquivo inteiro."""
+    blocos = _blocos_xlsx(conteudo) if nome_arquivo.lower().endswith(".xlsx") else _blocos_csv(conteudo)
+    aceitas, rejeitadas = [], []
+    proxima_linha = 2  # linha 1 é o cabeçalho, como o usuário vê na planilha
+    for bloco in blocos:
+        validas, invalidas = validar_bloco(bloco, proxima_linha)
+        proxima_linha += len(bloco)
+        aceitas.append(validas)
+        rejeitadas.append(invalidas)
+    aceitas = pd.concat(aceitas, ignore_index=True) if aceitas else pd.DataFrame(columns=CAMPOS + ['linha'])
+    rejeitadas = pd.concat(rejeitadas, ignore_index=True) if rejeitadas else pd.DataFrame(columns=['Linha', 'Erro'])
+    return aceitas, rejeitadas
+
+
+def montar_lotes(aceitas):
+    """
+    Divide as linhas aceitas em lotes que cabem num WriteBatch: os ASOs, uma
+    entrada do índice por funcionário do lote, as estatísticas e o progresso.
+    A ordem (por nome e linha) é determinística, para a retomada achar os mesmos lotes.
+    """
+    ordenadas = aceitas.sort_values(['nome_funcionario', 'linha'], kind='stable')
+    lotes, atual, nomes = [], [], set()
+    for registro in ordenadas.to_dict('records'):
+        novos_nomes = len(nomes) + (registro['nome_funcionario'] not in nomes)
+        if atual and len(atual) + 1 + novos_nomes + 2 > LIMITE_ESCRITAS_BATCH:
+            lotes.append(atual)
+            atual, nomes = [], set()
+        atual.append(registro)
+        nomes.add(registro['nome_funcionario'])
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+def _dados_aso(registro, id_imp, usuario):
+    return {
+        "nome_funcionario": registro['nome_funcionario'],
+        "funcao": registro['funcao'],
+        "tipo_exame": registro['tipo_exame'],
+        "resultado": registro['resultado'],
+        "data_exame": registro['data_exame'].to_pydatetime(),
+        "data_vencimento": registro['data_vencimento'].to_pydatetime(),
+        "nome_medico": registro['nome_medico'],
+        "crm_medico": registro['crm_medico'],
+        "anexos": [],
+        "lancado_por": usuario,
+        "data_lancamento": firestore.SERVER_TIMESTAMP,
+        "importacao": id_imp,
+        **campos_de_atualizacao()
+    }
+
+
+def _ultimos_exames_existentes(nomes):
+    """{nome: data do último exame} segundo o índice de funcionários, com leituras em lote."""
+    db = obter_db()
+    nomes = list(nomes)
+    resultado = {}
+    for inicio in range(0, len(nomes), LIMITE_ESCRITAS_BATCH):
+        refs = [db.collection(COLECAO_FUNCIONARIOS).document(id_funcionario(n)) for n in nomes[inicio:inicio + LIMITE_ESCRITAS_BATCH]]
+        for doc in db.get_all(refs):
+            if doc.exists:
+                dados = doc.to_dict()
+                resultado[dados.get("nome_funcionario")] = dados.get("ultimo_exame")
+    return resultado
+
+
+def _montar_batch(indice, lote, id_imp, usuario, ultimos_exames):
+    db = obter_db()
+    batch = db.batch()
+    asos = []
+    por_nome = {}
+    for registro in lote:
+        dados = _dados_aso(registro, id_imp, usuario)
+        # Id derivado da importação e da linha: regravar o mesmo lote não duplica o ASO
+        batch.set(db.collection(COLECAO_ASOS).document(f"{id_imp[:16]}_{registro['linha']:07d}"), dados)
+        asos.append(dados)
+        por_nome[registro['nome_funcionario']] = por_nome.get(registro['nome_funcionario'], 0) + 1
+    for nome, quantidade in por_nome.items():
+        batch.set(db.collection(COLECAO_FUNCIONARIOS).document(id_funcionario(nome)), {
+            "nome_funcionario": nome,
+            "total_asos": firestore.Increment(quantidade),
+            "ultimo_exame": ultimos_exames[nome],
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    adicionar_incrementos_criacao(batch, asos)
+    batch.set(db.collection(COLECAO_IMPORTACOES).document(id_imp),
+              {"lotes_concluidos": firestore.ArrayUnion([indice]), "atualizado_em": firestore.SERVER_TIMESTAMP},
+              merge=True)
+    return batch
+
+
+def _gravar_lote(indice, lote, id_imp, usuario, ultimos_exames):
+    for tentativa in range(MAX_TENTATIVAS):
+        if tentativa:
+            time.sleep(0.5 * 2 ** tentativa)
+            # O commit anterior pode ter sido aplicado mesmo com erro na resposta;
+            # regravar somaria os incrementos de novo
+            if indice in (progresso_importacao(id_imp) or {}).get("lotes_concluidos", []):
+                return len(lote)
+        try:
+            _montar_batch(indice, lote, id_imp, usuario, ultimos_exames).commit()
+            return len(lote)
+        except Exception:
+            if tentativa + 1 == MAX_TENTATIVAS:
+                raise
+
+
+def progresso_importacao(id_imp):
+    """Documento de progresso de uma importação anterior do mesmo arquivo (dict) ou None."""
+    doc = obter_db().collection(COLECAO_IMPORTACOES).document(id_imp).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def importar(conteudo, nome_arquivo, usuario, ao_progredir=None):
+    """
+    Importa o arquivo. Devolve um dict com id, gravadas, ja_gravadas,
+    rejeitadas (DataFrame do relatório de erros), falhas (lotes que não
+    puderam ser gravados) e total_lotes. `ao_progredir(concluidos, total)` é
+    chamado a cada lote gravado.
+    """
+    id_imp = id_importacao(conteudo)
+    aceitas, rejeitadas = ler_e_validar(conteudo, nome_arquivo)
+    lotes = montar_lotes(aceitas)
+
+    anterior = progresso_importacao(id_imp) or {}
+    concluidos = set(anterior.get("lotes_concluidos", []))
+    pendentes = [i for i in range(len(lotes)) if i not in concluidos]
+    ja_gravadas = sum(len(lotes[i]) for i in concluidos if i < len(lotes))
+
+    db = obter_db()
+    db.collection(COLECAO_IMPORTACOES).document(id_imp).set({
+        "arquivo": nome_arquivo,
+        "importado_por": usuario,
+        "total_linhas": len(aceitas) + len(rejeitadas),
+        "linhas_aceitas": len(aceitas),
+        "linhas_rejeitadas": len(rejeitadas),
+        "total_lotes": len(lotes),
+        "status": "em_andamento",
+        "atualizado_em": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+    # Último exame de cada funcionário: o maior entre o índice atual e o arquivo inteiro,
+    # igual em todos os lotes do mesmo nome (um nome pode cair em dois lotes paralelos)
+    maximos = aceitas.groupby('nome_funcionario')['data_exame'].max()
+    ultimos_exames = {nome: data.to_pydatetime() for nome, data in maximos.items()}
+    for nome, data in _ultimos_exames_existentes(ultimos_exames).items():
+        if nome in ultimos_exames and data is not None:
+            existente = data.replace(tzinfo=None) if getattr(data, "tzinfo", None) else data
+            ultimos_exames[nome] = max(ultimos_exames[nome], existente)
+
+    gravadas, falhas = 0, {}
+    feitos = len(concluidos)
+    if pendentes:
+        with ThreadPoolExecutor(max_workers=MAX_BATCHES_SIMULTANEOS) as executor:
+            futuros = {executor.submit(_gravar_lote, i, lotes[i], id_imp, usuario, ultimos_exames): i
+                       for i in pendentes}
+            for futuro in as_completed(futuros):
+                try:
+                    gravadas += futuro.result()
+                except Exception as e:
+                    falhas[futuros[futuro]] = str(e)
+                feitos += 1
+                if ao_progredir:
+                    ao_progredir(feitos, len(lotes))
+
+    db.collection(COLECAO_IMPORTACOES).document(id_imp).set({
+        "status": "interrompida" if falhas else "concluida",
+        "atualizado_em": firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    carregar_estatisticas.clear()
+    carregar_nomes_funcionarios.clear()
+    return {
+        "id": id_imp,
+        "gravadas": gravadas,
+        "ja_gravadas": ja_gravadas,
+        "rejeitadas": rejeitadas,
+        "falhas": falhas,
+        "total_lotes": len(lotes),
+    }
+
+
+def relatorio_erros_csv(rejeitadas):
+    """CSV (bytes) com as linhas rejeitadas e o motivo, para download."""
+    return rejeitadas.to_csv(index=False, sep=";").encode("utf-8-sig")
@@ -0,0 +1,58 @@
+from datetime import datetime, time, timedelta, timezone
+
+import pandas as pd
+from firebase_utils import obter_db, firestore
+
+# --- Consulta dos logs de atividade ---
+# Os filtros (usuário, ação e período) vão para a consulta no Firestore, então
+# só os logs que batem são lidos, em páginas com cursor (start_after no último
+# documento da página anterior). As combinações de filtro com a ordenação por
+# data usam os índices compostos de `firestore.indexes.json`.
+
+COLECAO_LOGS = "logs"
+TAMANHO_PAGINA_LOGS = 200
+ACOES_LOG = [
+    "Login Succeeded", "Login Failed", "Logout",
+    "ASO Created", "ASO Edited", "ASO Deleted", "ASO Bulk Import",
+    "User Created", "User Enabled", "User Disabled", "User Role Changed", "Password Changed",
+]
+COLUNAS_LOGS = ["timestamp", "user_email", "action", "details"]
+
+
+def _inicio_do_dia(dia):
+    # Os logs são gravados em UTC (ver log_activity)
+    return datetime.combine(dia, time.min, tzinfo=timezone.utc)
+
+
+def buscar_logs(usuario=None, acao=None, data_inicio=None, data_fim=None, cursor=None,
+                tamanho=TAMANHO_PAGINA_LOGS):
+    """
+    Uma página de logs, do mais recente para o mais antigo. `cursor` é o
+    último documento da página anterior. Devolve (documentos, tem_mais).
+    """
+    query = obter_db().collection(COLECAO_LOGS)
+    if usuario:
+        query = query.where("user_email", "==", usuario)
+    if acao:
+        query = query.where("action", "==", acao)
+    if data_inicio:
+        query = query.where("timestamp", ">=", _inicio_do_dia(data_inicio))
+    if data_fim:
+        query = query.where("timestamp", "<", _inicio_do_dia(data_fim + timedelta(days=1)))
+    query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+    if cursor is not None:
+        query = query.start_after(cursor)
+    docs = list(query.limit(tamanho + 1).stream())
+    return docs[:tamanho], len(docs) > tamanho
+
+
+def formatar_logs(docs):
+    return formatar_registros([doc.to_dict() for doc in docs])
+
+
+def formatar_registros(registros):
+    """DataFrame para exibição, com a data formatada de uma vez para a página inteira."""
+    df = pd.DataFrame(registros).reindex(columns=COLUNAS_LOGS)
+    datas = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
+    df['timestamp'] = datas.dt.strftime('%d/%m/%Y %H:%M:%S').fillna('N/A')
+    return df
@@ -0,0 +1,164 @@
+import argparse
+import gzip
+import io
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+
+# --- Retenção e arquivamento dos logs de atividade ---
+# Logs mais antigos que DIAS_RETENCAO saem da coleção `logs` e vão para o
+# Cloud Storage, um arquivo JSONL compactado com gzip por dia:
+#     logs_arquivo/AAAA/MM/AAAA-MM-DD.jsonl.gz
+# O dia é gravado no Storage antes de os documentos serem excluídos (em
+# batches de 500). Se o job cair no meio, a próxima execução regrava o dia
+# juntando o que já estava no arquivo, sem duplicar registros (pelo id).
+# As funções recebem `db` e `bucket` para servirem tanto ao job em main.py
+# quanto à linha de comando:
+#     python logs_retencao.py [--dias 90] [--simular]
+
+COLECAO_LOGS = "logs"
+PREFIXO_ARQUIVO = "logs_arquivo/"
+DIAS_RETENCAO = 90
+TAMANHO_PAGINA = 500
+TAMANHO_LOTE_EXCLUSAO = 500
+
+
+def caminho_arquivo(dia):
+    return f"{PREFIXO_ARQUIVO}{dia:%Y/%m}/{dia.isoformat()}.jsonl.gz"
+
+
+def _inicio_do_dia(dia):
+    return datetime(dia.year, dia.month, dia.day, tzinfo=timezone.utc)
+
+
+def _serializar(doc):
+    registro = doc.to_dict()
+    registro["id"] = doc.id
+    if isinstance(registro.get("timestamp"), datetime):
+        registro["timestamp"] = registro["timestamp"].isoformat()
+    return registro
+
+
+def _documentos_do_dia(db, dia):
+    """Todos os logs do dia (UTC), lidos em páginas com cursor."""
+    query = (db.collection(COLECAO_LOGS)
+             .where("timestamp", ">=", _inicio_do_dia(dia))
+             .where("timestamp", "<", _inicio_do_dia(dia + timedelta(days=1)))
+             .order_by("timestamp"))
+    docs, ultimo = [], None
+    while True:
+        pagina = query.start_after(ultimo) if ultimo is not None else query
+        lidos = list(pagina.limit(TAMANHO_PAGINA).stream())
+        docs.extend(lidos)
+        if len(lidos) < TAMANHO_PAGINA:
+            return docs
+        ultimo = lidos[-1]
+
+
+def _ler_arquivo(blob):
+    with blob.open("rb") as bruto, gzip.GzipFile(fileobj=bruto) as compactado:
+        for linha in compactado:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def _gravar_dia(bucket, dia, registros):
+    blob = bucket.blob(caminho_arquivo(dia))
+    if blob.exists():
+        # Execução anterior interrompida entre o upload e a exclusão
+        ids = {r["id"] for r in registros}
+        registros = [r for r in _ler_arquivo(blob) if r.get("id") not in ids] + registros
+        registros.sort(key=lambda r: r.get("timestamp") or "")
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as compactado:
+        for registro in registros:
+            compactado.write(json.dumps(registro, ensure_ascii=False).encode("utf-8") + b"\n")
+    dados = buffer.getvalue()
+    blob.upload_from_string(dados, content_type="application/gzip")
+    return len(dados)
+
+
+def _excluir(db, docs):
+    for inicio in range(0, len(docs), TAMANHO_LOTE_EXCLUSAO):
+        batch = db.batch()
+        for doc in docs[inicio:inicio + TAMANHO_LOTE_EXCLUSAO]:
+            batch.delete(doc.reference)
+        batch.commit()
+
+
+def arquivar_logs(db, bucket, dias_retencao=DIAS_RETENCAO, simular=False, hoje=None):
+    """
+    Move para o Storage os logs de dias anteriores ao corte (hoje - dias_retencao).
+    Com `simular=True` só conta o que seria arquivado. Devolve o relatório da execução.
+    """
+    inicio_execucao = time.perf_counter()
+    hoje = hoje or datetime.now(timezone.utc).date()
+    corte = hoje - timedelta(days=dias_retencao)
+    relatorio = {"corte": corte.isoformat(), "dias": [], "logs_arquivados": 0, "bytes_gravados": 0,
+                 "simulacao": simular}
+
+    proximo_dia = None
+    while True:
+        # O log mais antigo ainda na coleção define o próximo dia a arquivar
+        query = db.collection(COLECAO_LOGS).where("timestamp", "<", _inicio_do_dia(corte))
+        if proximo_dia is not None:
+            query = query.where("timestamp", ">=", _inicio_do_dia(proximo_dia))
+        mais_antigo = list(query.order_by("timestamp").limit(1).stream())
+        if not mais_antigo:
+            break
+        dia = mais_antigo[0].to_dict()["timestamp"].astimezone(timezone.utc).date()
+        docs = _documentos_do_dia(db, dia)
+        if not simular:
+            relatorio["bytes_gravados"] += _gravar_dia(bucket, dia, [_serializar(d) for d in docs])
+            _excluir(db, docs)
+        relatorio["dias"].append({"dia": dia.isoformat(), "logs": len(docs)})
+        relatorio["logs_arquivados"] += len(docs)
+        # Na simulação nada é excluído; avança pelo dia seguinte
+        proximo_dia = dia + timedelta(days=1)
+
+    relatorio["duracao_s"] = round(time.perf_counter() - inicio_execucao, 3)
+    return relatorio
+
+
+def dias_arquivados(bucket):
+    """Datas (date) com arquivo no Storage, da mais recente para a mais antiga."""
+    dias = []
+    for blob in bucket.list_blobs(prefix=PREFIXO_ARQUIVO):
+        nome = blob.name.rsplit("/", 1)[-1].removesuffix(".jsonl.gz")
+        try:
+            dias.append(date.fromisoformat(nome))
+        except ValueError:
+            continue
+    return sorted(dias, reverse=True)
+
+
+def buscar_no_arquivo(bucket, dia, usuario=None, acao=None, limite=None):
+    """
+    Lê o arquivo do dia em fluxo (sem baixar tudo para a memória) e devolve os
+    registros (dicts) que batem com os filtros, até `limite`.
+    """
+    blob = bucket.blob(caminho_arquivo(dia))
+    if not blob.exists():
+        return []
+    encontrados = []
+    for registro in _ler_arquivo(blob):
+        if usuario and registro.get("user_email") != usuario:
+            continue
+        if acao and registro.get("action") != acao:
+            continue
+        encontrados.append(registro)
+        if limite and len(encontrados) >= limite:
+            break
+    return encontrados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva no Storage os logs mais antigos que o período de retenção.")
+    parser.add_argument("--dias", type=int, default=DIAS_RETENCAO, help=f"dias mantidos na coleção (padrão: {DIAS_RETENCAO})")
+    parser.add_argument("--simular", action="store_true", help="só mostra o que seria arquivado")
+    args = parser.parse_args()
+
+    from firebase_utils import obter_db, obter_bucket
+    print(f"--- Arquivando logs com mais de {args.dias} dias ---")
+    relatorio = arquivar_logs(obter_db(), obter_bucket(), args.dias, simular=args.simular)
+    print(json.dumps(relatorio, indent=2))
@@ -1,27 +1,165 @@
+import json
+import os
+import time
 import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime, timedelta
+from firebase_admin import credentials, firestore, storage
+from datetime import datetime, timedelta, timezone
 import smtplib # Ou use uma API como SendGrid
 
-def check_asos_expiration(request):
-    # Inicializa o app dentro da função
-    firebase_admin.initialize_app()
-    db = firestore.client()
+# --- Job de verificação de vencimentos ---
+# Para testar localmente contra o emulador do Firestore:
+#     export FIRESTORE_EMULATOR_HOST=localhost:8080
+#     export GOOGLE_CLOUD_PROJECT=controle-de-aso
+#     python main.py
+# A consulta combina intervalo em `data_vencimento` com `tipo_exame != Demissional`
+# e precisa do índice composto (data_vencimento ASC, tipo_exame ASC) na coleção `asos`:
+# o SDK acrescenta o campo do `!=` à ordenação, depois do order_by.
+
+DIAS_AVISO = 60
+# ASOs vencidos há mais tempo que isso já foram avisados e não são relidos
+DIAS_VENCIDOS_CONSIDERADOS = 30
+TAMANHO_PAGINA = 500
+CAMPOS = ['nome_funcionario', 'data_vencimento', 'tipo_exame']
+
+# --- Expurgo das lápides de ASOs excluídos ---
+# Os snapshots (aso_sync.py) só leem lápides gravadas depois da última
+# releitura completa, que acontece ao menos a cada 24 h; lápides mais velhas
+# que isso, com folga, não são mais consultadas por ninguém.
+RETENCAO_LAPIDES = timedelta(days=2)
+TAMANHO_LOTE_LAPIDES = 500
+
+_db = None
+
+
+def obter_db():
+    """Cliente Firestore reaproveitado entre invocações na mesma instância."""
+    global _db
+    if _db is None:
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            firebase_admin.initialize_app()
+        _db = firestore.client()
+    return _db
 
-    # Lógica para encontrar ASOs vencendo
-    hoje = datetime.now()
-    limite_60_dias = hoje + timedelta(days=60)
 
-    asos_vencendo = db.collection('asos').where('data_vencimento', '<=', limite_60_dias).stream()
+def buscar_asos_vencendo(db, inicio, fim, tamanho_pagina=TAMANHO_PAGINA):
+    """Percorre em páginas os ASOs não demissionais com vencimento em [inicio, fim]."""
+    query = (db.collection('asos')
+             .where('data_vencimento', '>=', inicio)
+             .where('data_vencimento', '<=', fim)
+             .where('tipo_exame', '!=', 'Demissional')
+             .order_by('data_vencimento')
+             .select(CAMPOS))
+    ultimo = None
+    while True:
+        pagina = query.start_after(ultimo) if ultimo is not None else query
+        docs = list(pagina.limit(tamanho_pagina).stream())
+        yield from docs
+        if len(docs) < tamanho_pagina:
+            return
+        ultimo = docs[-1]
 
-    corpo_email = "Relatório de ASOs com vencimento próximo:\n\n"
-    for aso in asos_vencendo:
+
+def executar_verificacao(db, hoje=None):
+    """Monta o corpo do email e devolve (corpo_email, relatorio_da_execucao)."""
+    inicio_execucao = time.perf_counter()
+    hoje = hoje or datetime.now(timezone.utc)
+    inicio = hoje - timedelta(days=DIAS_VENCIDOS_CONSIDERADOS)
+    fim = hoje + timedelta(days=DIAS_AVISO)
+
+    linhas = ["Relatório de ASOs com vencimento próximo:", ""]
+    lidos = 0
+    vencidos = 0
+    for aso in buscar_asos_vencendo(db, inicio, fim):
+        lidos += 1
         dados = aso.to_dict()
+        if dados['data_vencimento'] < hoje:
+            vencidos += 1
         vencimento_str = dados['data_vencimento'].strftime('%d/%m/%Y')
-        corpo_email += f"- {dados['nome_funcionario']}, Vence em: {vencimento_str}\n"
+        linhas.append(f"- {dados.get('nome_funcionario', 'N/A')}, Vence em: {vencimento_str}")
+    tempo_consulta = time.perf_counter() - inicio_execucao
+
+    relatorio = {
+        "janela_inicio": inicio.isoformat(),
+        "janela_fim": fim.isoformat(),
+        "documentos_lidos": lidos,
+        "vencidos": vencidos,
+        "a_vencer": lidos - vencidos,
+        "tempo_consulta_s": round(tempo_consulta, 3),
+        "tempo_total_s": round(time.perf_counter() - inicio_execucao, 3),
+    }
+    return "\n".join(linhas) + "\n", relatorio
+
+
+def check_asos_expiration(request):
+    db = obter_db()
+    corpo_email, relatorio = executar_verificacao(db)
 
     # Lógica de envio de email (exemplo com smtplib)
     # Substitua com seus dados de servidor de email
     # ... código para enviar o `corpo_email` para o email do admin ...
 
-    return 'Verificação concluída.', 200
+    print(json.dumps(relatorio))
+    return json.dumps({"mensagem": "Verificação concluída.", **relatorio}), 200, {'Content-Type': 'application/json'}
+
+
+def archive_old_logs(request):
+    # Job de retenção dos logs (ver logs_retencao.py). Variáveis de ambiente:
+    # STORAGE_BUCKET (obrigatória) e DIAS_RETENCAO_LOGS (padrão: 90).
+    from logs_retencao import arquivar_logs, DIAS_RETENCAO
+    db = obter_db()
+    bucket = storage.bucket(os.environ["STORAGE_BUCKET"])
+    dias = int(os.environ.get("DIAS_RETENCAO_LOGS", DIAS_RETENCAO))
+    relatorio = arquivar_logs(db, bucket, dias)
+    print(json.dumps(relatorio))
+    return json.dumps({"mensagem": "Arquivamento concluído.", **relatorio}), 200, {'Content-Type': 'application/json'}
+
+
+def expurgar_lapides(db, agora=None, retencao=RETENCAO_LAPIDES):
+    """Exclui as lápides de `asos_excluidos` mais antigas que `retencao`, em batches."""
+    inicio_execucao = time.perf_counter()
+    limite = (agora or datetime.now(timezone.utc)) - retencao
+    query = (db.collection('asos_excluidos')
+             .where('updated_at', '<', limite)
+             .order_by('updated_at')
+             .select([])
+             .limit(TAMANHO_LOTE_LAPIDES))
+    excluidas = 0
+    while True:
+        docs = list(query.stream())
+        if not docs:
+            break
+        batch = db.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+        batch.commit()
+        excluidas += len(docs)
+        if len(docs) < TAMANHO_LOTE_LAPIDES:
+            break
+    return {"limite": limite.isoformat(), "lapides_excluidas": excluidas,
+            "tempo_total_s": round(time.perf_counter() - inicio_execucao, 3)}
+
+
+def purge_old_tombstones(request):
+    # Job diário de expurgo das lápides (ver expurgar_lapides)
+    relatorio = expurgar_lapides(obter_db())
+    print(json.dumps(relatorio))
+    return json.dumps({"mensagem": "Expurgo de lápides concluído.", **relatorio}), 200, {'Content-Type': 'application/json'}
+
+
+def clean_orphan_attachments(request):
+    # Job de limpeza dos anexos órfãos (ver anexos_limpeza.py). Variável de ambiente:
+    # STORAGE_BUCKET (obrigatória). Com ?simular=1 só devolve o relatório.
+    from anexos_limpeza import limpar_anexos_orfaos
+    simular = request is not None and request.args.get("simular") == "1"
+    bucket = storage.bucket(os.environ["STORAGE_BUCKET"])
+    relatorio = limpar_anexos_orfaos(obter_db(), bucket, simular=simular)
+    print(json.dumps(relatorio))
+    return json.dumps({"mensagem": "Limpeza de anexos concluída.", **relatorio}), 200, {'Content-Type': 'application/json'}
+
+
+if __name__ == "__main__":
+    corpo_email, relatorio = executar_verificacao(obter_db())
+    print(corpo_email)
+    print(json.dumps(relatorio, indent=2))
@@ -1,8 +1,16 @@
 import streamlit as st
 import pandas as pd
-from firebase_utils import db, bucket, log_activity, firestore
-from datetime import datetime, timezone
-import urllib.parse
+from firebase_utils import log_activity
+from aso_repository import repositorio_asos
+from estatisticas_dashboard import carregar_estatisticas, reconstruir_estatisticas
+from aso_status import classificar_status, rotulo_vencimento, STATUS_VENCIDO, STATUS_ARQUIVADO
+from aso_paginacao import controles_paginacao, pagina_local, navegacao
+from datetime import datetime, date
+from google.api_core.exceptions import FailedPrecondition
+from funcionarios_index import atualizar_funcionarios
+from anexos import (enviar_anexos_com_progresso, remover_blobs, agendar_limpeza,
+                    url_anexo, url_miniatura, nome_do_anexo)
+from busca_nomes import indice_nomes
 
 # --- Verificação de Login ---
 if not st.session_state.get("authentication_status"):
@@ -18,46 +26,44 @@ if 'edit_aso_id' not in st.session_state: st.session_state.edit_aso_id = None
 st.logo("logobd.png")
 st.title("Dashboard de Controle de ASOs")
 
-# --- Função para carregar os dados ---
-@st.cache_data(ttl=60)
-def carregar_asos_firestore():
-    docs = db.collection("asos").stream()
-    asos = []
-    for doc in db.collection("asos").stream():
-        data = doc.to_dict()
-        data['id'] = doc.id
-        asos.append(data)
-    if not asos:
-        return pd.DataFrame()
-    return pd.DataFrame(asos)
-
-# Carrega os dados
-df_asos = carregar_asos_firestore()
-
-if df_asos.empty:
+# --- Carregamento dos dados ---
+# Repositório compartilhado pelo processo, sincronizado incrementalmente: cada
+# atualização lê apenas os documentos alterados desde a última sincronização.
+repositorio = repositorio_asos()
+
+# --- Processamento de Dados ---
+# Recalculado só quando os dados (ou o dia) mudam, e compartilhado entre as sessões.
+# Alertas e relação partem do ASO atual de cada funcionário (o de exame mais
+# recente): exames substituídos por um mais novo não contam como vencidos.
+def classificar_atuais():
+    df = pd.DataFrame(repositorio.atuais())
+    return classificar_status(df) if not df.empty else df
+
+def classificar_asos():
+    df = repositorio.dataframe()
+    return classificar_status(df) if not df.empty else df
+
+df_atuais = repositorio.calcular("status_atuais", classificar_atuais, date.today()).copy()
+
+if df_atuais.empty:
     st.info("Nenhum ASO cadastrado ainda. Vá para a página 'Lançar ASO' para adicionar o primeiro.")
     st.stop()
 
-# --- Processamento de Dados ---
-df_asos['data_vencimento'] = pd.to_datetime(df_asos['data_vencimento'])
-hoje = datetime.now(timezone.utc)
-df_asos['dias_para_vencer'] = (df_asos['data_vencimento'] - hoje).dt.days
-
-def definir_status(row):
-    if row.get('tipo_exame') == 'Demissional': return 'Arquivado'
-    dias = row['dias_para_vencer']
-    if dias < 0: return "Vencido"
-    elif dias <= 30: return "Vence em até 30 dias"
-    elif dias <= 60: return "Vence em até 60 dias"
-    else: return "Em dia"
-df_asos['Status'] = df_asos.apply(definir_status, axis=1)
+# --- Estatísticas agregadas ---
+# A distribuição por tipo (todos os exames) vem de um único documento mantido pelas escritas de ASO
+estatisticas = carregar_estatisticas()
+if estatisticas is None:
+    # Primeiro uso (ou documento nunca reconstruído): monta a partir dos ASOs já carregados em memória
+    estatisticas = reconstruir_estatisticas(repositorio.documentos())
 
 # --- Exibição dos Alertas ---
 st.subheader("Alertas Importantes")
+st.caption("Considera apenas o ASO mais recente de cada funcionário.")
 col_metric1, col_metric2, col_metric3 = st.columns(3)
-vencidos = df_asos[df_asos['Status'] == 'Vencido'].shape[0]
-ate_30_dias = df_asos[df_asos['Status'] == 'Vence em até 30 dias'].shape[0]
-ate_60_dias = df_asos[df_asos['Status'] == 'Vence em até 60 dias'].shape[0]
+contagem_status = df_atuais['Status'].value_counts()
+vencidos = int(contagem_status.get(STATUS_VENCIDO, 0))
+ate_30_dias = int(contagem_status.get(rotulo_vencimento(30), 0))
+ate_60_dias = int(contagem_status.get(rotulo_vencimento(60), 0))
 col_metric1.metric("ASOs Vencidos", vencidos)
 col_metric2.metric("Vencem em até 30 dias", ate_30_dias)
 col_metric3.metric("Vencem em até 60 dias", ate_60_dias)
@@ -70,17 +76,17 @@ chart_col1, chart_col2 = st.columns(2)
 
 with chart_col1:
     st.write(f"**Vencimentos por Mês ({datetime.now().year})**")
-    df_chart = df_asos[df_asos['Status'].isin(['Vencido', 'Vence em até 30 dias', 'Vence em até 60 dias'])].copy()
     current_year = datetime.now().year
-    df_chart = df_chart[df_chart['data_vencimento'].dt.year == current_year]
-    if df_chart.empty:
+    # Vencidos ou vencendo em até 60 dias, entre os ASOs atuais
+    vencendo = df_atuais[(df_atuais['Status'] != STATUS_ARQUIVADO) & (df_atuais['dias_para_vencer'] <= 60)
+                         & (df_atuais['data_vencimento'].dt.year == current_year)]
+    contagem_meses = (vencendo['data_vencimento'].dt.month.value_counts()
+                      .reindex(range(1, 13), fill_value=0).to_dict())
+    if not any(contagem_meses.values()):
         st.info(f"Nenhum ASO vencendo em {current_year}.")
     else:
-        df_chart['mes_vencimento'] = df_chart['data_vencimento'].dt.month
-        vencimentos_por_mes = df_chart.groupby('mes_vencimento').size().reset_index(name='Quantidade')
         meses_pt = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
-        df_grafico = pd.DataFrame({'mes_vencimento': range(1, 13)})
-        df_grafico = pd.merge(df_grafico, vencimentos_por_mes, on='mes_vencimento', how='left').fillna(0)
+        df_grafico = pd.DataFrame({'mes_vencimento': list(contagem_meses), 'Quantidade': list(contagem_meses.values())})
         df_grafico['Mês'] = df_grafico['mes_vencimento'].map(meses_pt)
         ordem_meses_cronologica = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
         df_grafico['Mês'] = pd.Categorical(df_grafico['Mês'], categories=ordem_meses_cronologica, ordered=True)
@@ -88,8 +94,9 @@ with chart_col1:
         st.bar_chart(df_grafico.set_index('Mês')[['Quantidade']])
 
 with chart_col2:
-    st.write("**Distribuição por Tipo de Exame**")
-    tipo_exame_counts = df_asos['tipo_exame'].value_counts()
+    st.write("**Distribuição por Tipo de Exame (todos os ASOs)**")
+    tipo_exame_counts = pd.Series(estatisticas.get('por_tipo', {}), dtype='int64')
+    tipo_exame_counts = tipo_exame_counts[tipo_exame_counts > 0].sort_values(ascending=False)
     if not tipo_exame_counts.empty:
         st.bar_chart(tipo_exame_counts)
     else:
@@ -99,23 +106,50 @@ with chart_col2:
 # --- Filtros e Tabela ---
 st.divider()
 st.subheader("Filtros e Relação de ASOs")
+historico_completo = st.toggle("Mostrar histórico completo (inclui ASOs substituídos)", value=False)
+if historico_completo:
+    df_base = repositorio.calcular("status", classificar_asos, date.today()).copy()
+else:
+    df_base = df_atuais
+
 filter_col1, filter_col2, filter_col3 = st.columns(3)
-status_options = df_asos['Status'].unique()
+status_options = df_base['Status'].unique()
 status_filter = filter_col1.multiselect("Filtrar por Status", options=status_options, default=status_options)
 nome_filter = filter_col2.text_input("Filtrar por Nome do Funcionário")
-tipo_exame_options = df_asos['tipo_exame'].dropna().unique()
+tipo_exame_options = df_base['tipo_exame'].dropna().unique()
 tipo_exame_filter = filter_col3.multiselect("Filtrar por Tipo de Exame", options=tipo_exame_options, default=tipo_exame_options)
 
-df_filtrado = df_asos[(df_asos['Status'].isin(status_filter)) & (df_asos['tipo_exame'].isin(tipo_exame_filter))]
+paginado = st.toggle("Lista paginada", value=True)
+
+# As páginas saem do snapshot já carregado, sem novas leituras no Firestore
+colunas_lista = ['nome_funcionario', 'funcao', 'data_vencimento', 'Status', 'id']
+tem_proxima = False
+df_filtrado = df_base[(df_base['Status'].isin(status_filter)) & (df_base['tipo_exame'].isin(tipo_exame_filter))]
 if nome_filter:
-    df_filtrado = df_filtrado[df_filtrado['nome_funcionario'].str.contains(nome_filter, case=False, na=False)]
+    # Busca sem acento ("joao" encontra "João"); o índice só é refeito quando os nomes mudam
+    nomes = repositorio.calcular("nomes_funcionarios", repositorio.nomes_funcionarios)
+    encontrados = indice_nomes(nomes).buscar(nome_filter)
+    df_filtrado = df_filtrado[df_filtrado['nome_funcionario'].isin(encontrados)]
 
-df_display = df_filtrado[['nome_funcionario', 'funcao', 'data_vencimento', 'Status', 'id']].copy()
-df_display['data_vencimento'] = df_display['data_vencimento'].dt.strftime('%d/%m/%Y')
+df_display = df_filtrado.reindex(columns=colunas_lista)
 
 # --- CORREÇÃO AQUI: Ordena o DataFrame pelo nome do funcionário ---
-df_display = df_display.sort_values(by='nome_funcionario', ascending=True)
+df_display = df_display.sort_values(by='nome_funcionario', ascending=True, key=lambda nomes: nomes.str.upper())
 
+if paginado:
+    chave_filtros = (historico_completo, tuple(sorted(status_filter)), nome_filter,
+                     tuple(sorted(tipo_exame_filter)))
+    estado_paginacao = controles_paginacao(chave_filtros)
+    df_display, tem_proxima = pagina_local(estado_paginacao, df_display)
+
+df_display = df_display.copy()
+df_display['data_vencimento'] = df_display['data_vencimento'].dt.strftime('%d/%m/%Y')
+
+
+# --- Documentos abertos em edição ou detalhes ---
+# Vêm do snapshot em memória (um único get_all para os que faltarem), então
+# digitar no formulário de edição não gera nenhuma leitura no Firestore.
+documentos_abertos = repositorio.obter_varios({st.session_state.edit_aso_id, st.session_state.expanded_aso})
 
 # --- Loop de Exibição com todas as Ações ---
 for index, row in df_display.iterrows():
@@ -143,10 +177,12 @@ for index, row in df_display.iterrows():
             st.error(f"Tem certeza que deseja excluir o ASO de **{row['nome_funcionario']}**?")
             confirm_col1, confirm_col2 = st.columns(2)
             if confirm_col1.button("SIM, EXCLUIR", key=f"confirm_del_{row['id']}", type="primary"):
-                db.collection('asos').document(row['id']).delete()
+                removido = repositorio.excluir(row['id'], st.session_state['username'])
+                # Os anexos saem do Storage em segundo plano, em lote
+                agendar_limpeza(removido)
                 log_activity(st.session_state['username'], "ASO Deleted", f"ID: {row['id']}")
                 st.session_state.delete_confirmation = None
-                carregar_asos_firestore.clear()
+                atualizar_funcionarios([row['nome_funcionario']])
                 st.success(f"ASO de {row['nome_funcionario']} excluído.")
                 st.rerun()
             if confirm_col2.button("Cancelar", key=f"cancel_del_{row['id']}"):
@@ -158,7 +194,7 @@ for index, row in df_display.iterrows():
         with st.form(key=f"edit_form_{row['id']}"):
             st.subheader(f"Editando ASO de {row['nome_funcionario']}")
             
-            aso_atual = db.collection('asos').document(row['id']).get().to_dict()
+            aso_atual, tempo_atualizacao = documentos_abertos.get(row['id'], ({}, None))
             
             tipos_exame = ["Admissional", "Periódico", "Demissional", "Mudança de Risco", "Retorno ao Trabalho"]
             resultados_exame = ["Apto", "Inapto", "Apto com Restrições"]
@@ -188,38 +224,25 @@ for index, row in df_display.iterrows():
             if not anexos_atuais:
                 st.info("Nenhum anexo existente.")
             else:
-                for i, anexo_url in enumerate(anexos_atuais):
+                for i, anexo in enumerate(anexos_atuais):
                     anexo_col1, anexo_col2 = st.columns([4, 1])
-                    file_name = urllib.parse.unquote(anexo_url.split('%2F')[-1].split('?')[0])
-                    anexo_col1.markdown(f"[{file_name}]({anexo_url})")
+                    anexo_col1.markdown(f"[{nome_do_anexo(anexo)}]({url_anexo(anexo)})")
                     if anexo_col2.checkbox("Remover", key=f"del_anexo_{row['id']}_{i}"):
-                        anexos_para_remover.append(anexo_url)
+                        anexos_para_remover.append(anexo)
 
             novos_anexos = st.file_uploader("Adicionar novos anexos", accept_multiple_files=True, key=f"upload_{row['id']}")
 
             submit_col1, submit_col2 = st.columns(2)
             if submit_col1.form_submit_button("Salvar Alterações", type="primary"):
                 with st.spinner("Atualizando ASO..."):
-                    for url in anexos_para_remover:
-                        try:
-                            path_start = url.find("/o/") + 3
-                            path_end = url.find("?alt=media")
-                            file_path = urllib.parse.unquote(url[path_start:path_end])
-                            blob = bucket.blob(file_path)
-                            blob.delete()
-                        except Exception as e:
-                            st.warning(f"Não foi possível remover o anexo {url}. Erro: {e}")
-
-                    urls_novos_anexos = []
-                    for arquivo in novos_anexos:
-                        file_name = f"asos/{st.session_state['uid']}/{datetime.now().strftime('%Y%m%d%H%M%S')}_{arquivo.name}"
-                        blob = bucket.blob(file_name)
-                        blob.upload_from_string(arquivo.getvalue(), content_type=arquivo.type)
-                        blob.make_public()
-                        urls_novos_anexos.append(blob.public_url)
-
-                    anexos_finais = [url for url in anexos_atuais if url not in anexos_para_remover]
-                    anexos_finais.extend(urls_novos_anexos)
+                    try:
+                        caminhos_novos_anexos, blobs_criados = enviar_anexos_com_progresso(novos_anexos, st.session_state['uid'])
+                    except Exception as e:
+                        st.error(f"Erro ao enviar os anexos: {e}")
+                        st.stop()
+
+                    anexos_finais = [anexo for anexo in anexos_atuais if anexo not in anexos_para_remover]
+                    anexos_finais.extend(caminhos_novos_anexos)
                     
                     update_data = {
                         'nome_funcionario': novo_nome, 'funcao': nova_funcao, 'tipo_exame': novo_tipo_exame,
@@ -229,11 +252,29 @@ for index, row in df_display.iterrows():
                         'anexos': anexos_finais
                     }
                     
-                    db.collection('asos').document(row['id']).update(update_data)
+                    # O update_time lido junto com o documento serve de precondição:
+                    # se outro usuário alterou o ASO nesse meio tempo, a gravação falha.
+                    try:
+                        repositorio.atualizar(row['id'], update_data, tempo_atualizacao)
+                    except FailedPrecondition:
+                        remover_blobs(blobs_criados)
+                        repositorio.invalidar()
+                        st.error("Este ASO foi alterado por outro usuário enquanto você editava. Recarregue a página e tente novamente.")
+                        st.stop()
+                    except Exception as e:
+                        remover_blobs(blobs_criados)
+                        st.error(f"Erro ao salvar o ASO: {e}")
+                        st.stop()
+
+                    # Os anexos só são removidos do Storage depois que o documento deixou de
+                    # referenciá-los; a fila de limpeza confere no Firestore se outro ASO
+                    # ainda compartilha o mesmo arquivo antes de excluí-lo
+                    agendar_limpeza({'anexos': anexos_para_remover})
+
                     log_activity(st.session_state['username'], "ASO Edited", f"ID: {row['id']}")
                     st.success("ASO atualizado com sucesso!")
                     st.session_state.edit_aso_id = None
-                    carregar_asos_firestore.clear()
+                    atualizar_funcionarios([aso_atual.get('nome_funcionario'), novo_nome])
                     st.rerun()
             
             if submit_col2.form_submit_button("Cancelar"):
@@ -244,9 +285,8 @@ for index, row in df_display.iterrows():
     elif st.session_state.expanded_aso == row['id']:
         with container:
             with st.expander("Detalhes do ASO", expanded=True):
-                doc = db.collection('asos').document(row['id']).get()
-                if doc.exists:
-                    details = doc.to_dict()
+                details, _ = documentos_abertos.get(row['id'], (None, None))
+                if details:
                     
                     st.write(f"**Nome do Funcionário:** {details.get('nome_funcionario', 'N/A')}")
                     st.write(f"**Função:** {details.get('funcao', 'N/A')}")
@@ -270,14 +310,21 @@ for index, row in df_display.iterrows():
                     anexos = details.get('anexos')
                     if anexos and isinstance(anexos, list):
                         st.write("**Anexos:**")
-                        for i, anexo_url in enumerate(anexos):
-                            st.markdown(f"- [Baixar Anexo {i+1}]({anexo_url})", unsafe_allow_html=True)
+                        miniaturas = [m for m in map(url_miniatura, anexos) if m]
+                        if miniaturas:
+                            st.image(miniaturas, width=120)
+                        for i, anexo in enumerate(anexos):
+                            st.markdown(f"- [Baixar Anexo {i+1}]({url_anexo(anexo)})", unsafe_allow_html=True)
                     
                     elif details.get('url_arquivo_aso'):
                         st.write("**Anexo:**")
-                        st.markdown(f"- [Baixar ASO]({details.get('url_arquivo_aso')})", unsafe_allow_html=True)
+                        st.markdown(f"- [Baixar ASO]({url_anexo(details.get('url_arquivo_aso'))})", unsafe_allow_html=True)
                     
                     else:
                         st.info("Nenhum anexo encontrado para este ASO.")
                 else:
                     st.warning("Não foi possível carregar os detalhes.")
+
+# --- Navegação entre páginas ---
+if paginado:
+    navegacao(estado_paginacao, tem_proxima)
@@ -1,5 +1,9 @@
 import streamlit as st
-from firebase_utils import db, bucket, log_activity, firestore
+from firebase_utils import log_activity, firestore
+from aso_repository import obter_repositorio
+from funcionarios_index import atualizar_funcionarios
+from anexos import enviar_anexos_com_progresso, remover_blobs
+from importacao_asos import importar, progresso_importacao, id_importacao, relatorio_erros_csv, CAMPOS_OBRIGATORIOS, CAMPOS_OPCIONAIS
 from datetime import datetime
 
 if not st.session_state.get("authentication_status"):
@@ -9,6 +13,59 @@ if not st.session_state.get("authentication_status"):
 st.logo("logobd.png")
 st.title("Lançamento de Novo ASO")
 
+modo = st.radio("Modo de lançamento", ["Um ASO", "Importar planilha (CSV/XLSX)"], horizontal=True)
+
+# --- Importação em massa ---
+if modo != "Um ASO":
+    st.caption(f"Colunas obrigatórias: {', '.join(CAMPOS_OBRIGATORIOS)}. Opcionais: {', '.join(CAMPOS_OPCIONAIS)}. "
+               "Também são aceitos os cabeçalhos do relatório XLSX. Datas em DD/MM/AAAA ou AAAA-MM-DD.")
+    arquivo_importacao = st.file_uploader("Selecione a planilha", type=['csv', 'xlsx'], key="arquivo_importacao")
+
+    if arquivo_importacao is not None:
+        conteudo = arquivo_importacao.getvalue()
+        anterior = progresso_importacao(id_importacao(conteudo))
+        if anterior and anterior.get('status') == 'concluida':
+            st.warning("Este arquivo já foi importado por completo; importar de novo não grava nada.")
+        elif anterior:
+            st.info(f"Importação anterior deste arquivo encontrada ({len(anterior.get('lotes_concluidos', []))} "
+                    f"de {anterior.get('total_lotes', '?')} lotes gravados). Ela será retomada de onde parou.")
+
+        if st.button("Importar ASOs", type="primary"):
+            barra = st.progress(0.0, text="Validando a planilha...")
+
+            def ao_progredir(concluidos, total):
+                barra.progress(concluidos / total, text=f"Gravando lotes: {concluidos} de {total}")
+
+            try:
+                resultado = importar(conteudo, arquivo_importacao.name, st.session_state['username'], ao_progredir)
+            except Exception as e:
+                st.error(f"Erro ao ler ou importar a planilha: {e}")
+                st.stop()
+            barra.empty()
+            # Os novos ASOs entram no snapshot compartilhado na próxima sincronização
+            obter_repositorio().invalidar()
+            log_activity(st.session_state['username'], "ASO Bulk Import",
+                         f"Arquivo: {arquivo_importacao.name}, gravados: {resultado['gravadas']}, "
+                         f"rejeitados: {len(resultado['rejeitadas'])}, lotes com falha: {len(resultado['falhas'])}")
+            st.session_state.resultado_importacao = {**resultado, "arquivo": arquivo_importacao.name}
+
+    # O resultado fica na sessão para sobreviver ao rerun do botão de download
+    resultado = st.session_state.get('resultado_importacao')
+    if resultado:
+        total_gravadas = resultado['gravadas'] + resultado['ja_gravadas']
+        st.success(f"{resultado['arquivo']}: {total_gravadas} ASO(s) gravado(s)"
+                   + (f" ({resultado['ja_gravadas']} em execução anterior)" if resultado['ja_gravadas'] else "") + ".")
+        if resultado['falhas']:
+            st.error(f"{len(resultado['falhas'])} de {resultado['total_lotes']} lotes não foram gravados. "
+                     "Envie o mesmo arquivo de novo para retomar.")
+        rejeitadas = resultado['rejeitadas']
+        if len(rejeitadas):
+            st.warning(f"{len(rejeitadas)} linha(s) rejeitada(s).")
+            st.dataframe(rejeitadas.head(100), hide_index=True, use_container_width=True)
+            st.download_button("📥 Baixar relatório de erros (CSV)", relatorio_erros_csv(rejeitadas),
+                               file_name=f"erros_importacao_{resultado['id'][:8]}.csv", mime="text/csv")
+    st.stop()
+
 with st.form("lancamento_aso_form", clear_on_submit=True):
     st.subheader("Dados do Funcionário e Exame")
     col1, col2 = st.columns(2)
@@ -38,15 +95,12 @@ if submit_button:
         st.warning("Por favor, preencha os campos obrigatórios (*).")
     else:
         with st.spinner("Salvando ASO e anexos..."):
-            urls_anexos = []
-            if arquivos_aso:
-                # MUDANÇA: Loop para fazer upload de cada arquivo
-                for arquivo in arquivos_aso:
-                    file_name = f"asos/{st.session_state['uid']}/{datetime.now().strftime('%Y%m%d%H%M%S')}_{arquivo.name}"
-                    blob = bucket.blob(file_name)
-                    blob.upload_from_string(arquivo.getvalue(), content_type=arquivo.type)
-                    blob.make_public()
-                    urls_anexos.append(blob.public_url)
+            try:
+                # Uploads em paralelo, com progresso por arquivo
+                anexos, blobs_criados = enviar_anexos_com_progresso(arquivos_aso, st.session_state['uid'])
+            except Exception as e:
+                st.error(f"Erro ao enviar os anexos: {e}")
+                st.stop()
 
             aso_data = {
                 "nome_funcionario": nome_funcionario,
@@ -57,11 +111,18 @@ if submit_button:
                 "data_vencimento": datetime.combine(data_vencimento, datetime.min.time()),
                 "nome_medico": nome_medico,
                 "crm_medico": crm_medico,
-                "anexos": urls_anexos, # MUDANÇA: Salva uma lista de URLs
+                "anexos": anexos, # Caminhos no Storage; as URLs são geradas na exibição
                 "lancado_por": st.session_state['username'],
                 "data_lancamento": firestore.SERVER_TIMESTAMP
             }
 
-            db.collection("asos").add(aso_data)
+            try:
+                obter_repositorio().criar(aso_data)
+            except Exception as e:
+                # Sem o documento, os anexos enviados ficariam órfãos no Storage
+                remover_blobs(blobs_criados)
+                st.error(f"Erro ao salvar o ASO: {e}")
+                st.stop()
+            atualizar_funcionarios([nome_funcionario])
             log_activity(st.session_state['username'], "ASO Created", f"Funcionário: {nome_funcionario}")
             st.success(f"ASO para '{nome_funcionario}' lançado com sucesso!")
@@ -1,17 +1,16 @@
 import streamlit as st
 import pandas as pd
 from firebase_admin import auth
-from firebase_utils import log_activity
-from datetime import datetime
+from firebase_utils import log_activity, obter_app
+from usuarios_admin import obter_diretorio_usuarios, definir_status, definir_papel, PAPEIS
 
 # --- Verificação de Login e Nível de Acesso ---
 if st.session_state.get("role") != "admin":
     st.error("Acesso negado. Esta página é restrita a administradores.")
     st.stop()
 
-# --- Inicialização do Session State para Ações ---
-if 'change_password_uid' not in st.session_state:
-    st.session_state.change_password_uid = None
+# O Admin SDK (auth) precisa do app do Firebase inicializado
+obter_app()
 
 # --- Configurações da Página ---
 st.logo("logobd.png")
@@ -29,6 +28,7 @@ with st.expander("➕ Cadastrar Novo Usuário"):
                 try:
                     user = auth.create_user(email=email, password=password)
                     auth.set_custom_user_claims(user.uid, {'role': role})
+                    obter_diretorio_usuarios().adicionar(user, role=role)
                     log_activity(st.session_state['username'], "User Created", f"New user: {email}, Role: {role}")
                     st.success(f"Usuário {email} criado com sucesso!")
                 except Exception as e:
@@ -39,75 +39,107 @@ with st.expander("➕ Cadastrar Novo Usuário"):
 st.divider()
 st.subheader("Gerenciar Usuários Existentes")
 
-# --- Função para Carregar Usuários com Cache ---
-@st.cache_data(ttl=60)
-def carregar_usuarios():
-    users_list = auth.list_users().iterate_all()
-    users_data = []
-    for user in users_list:
-        role = user.custom_claims.get('role', 'usuario') if user.custom_claims else 'usuario'
-        last_signed_in = 'Nunca'
-        if user.user_metadata and user.user_metadata.last_sign_in_timestamp:
-            last_signed_in = datetime.fromtimestamp(user.user_metadata.last_sign_in_timestamp / 1000).strftime('%d/%m/%Y %H:%M')
-            
-        users_data.append({
-            "uid": user.uid, 
-            "email": user.email, 
-            "role": role, 
-            "disabled": user.disabled,
-            "last_sign_in": last_signed_in
-        })
-    return users_data
+diretorio = obter_diretorio_usuarios()
+
+# --- Busca e Paginação ---
+if 'admin_pagina' not in st.session_state:
+    st.session_state.admin_pagina = 0
+
+col_busca, col_tamanho, col_recarregar = st.columns([4, 1, 1])
+busca = col_busca.text_input("Buscar por email (início do endereço)", key="admin_busca")
+tamanho_pagina = col_tamanho.selectbox("Por página", [25, 50, 100], key="admin_tamanho_pagina")
+col_recarregar.write("")
+if col_recarregar.button("🔄 Recarregar lista"):
+    diretorio.recarregar()
+    st.session_state.admin_pagina = 0
+
+# Volta para a primeira página quando a busca ou o tamanho mudam
+chave_filtros = (busca, tamanho_pagina)
+if st.session_state.get('admin_filtros') != chave_filtros:
+    st.session_state.admin_filtros = chave_filtros
+    st.session_state.admin_pagina = 0
+
+def registrar_resultado(acao_log, descricao, sucesso, falhas, usuarios_por_uid):
+    # As mensagens são mostradas depois do st.rerun, com a tabela já atualizada
+    mensagens = []
+    for uid in sucesso:
+        log_activity(st.session_state['username'], acao_log, f"User: {usuarios_por_uid[uid]['email']}")
+    if sucesso:
+        mensagens.append(("success", f"{len(sucesso)} usuário(s) {descricao}."))
+    for uid, erro in falhas.items():
+        mensagens.append(("error", f"Falha em {usuarios_por_uid[uid]['email']}: {erro}"))
+    st.session_state.admin_mensagens = mensagens
+
+for tipo, mensagem in st.session_state.pop('admin_mensagens', []):
+    getattr(st, tipo)(mensagem)
 
 try:
-    usuarios = carregar_usuarios()
-    
-    # --- Loop Interativo para Gerenciar Usuários ---
-    for user in usuarios:
-        if user['uid'] == st.session_state.get('uid'):
-            continue
-
-        with st.container(border=True):
-            col1, col2, col3 = st.columns([3, 2, 2])
-            
-            status_text = "🔴 Desabilitado" if user['disabled'] else "🟢 Habilitado"
-            col1.write(f"**Email:** {user['email']}")
-            col1.write(f"**Nível:** {user['role'].capitalize()}")
-            col1.write(f"**Status:** {status_text}")
-
-            # Ações de Habilitar/Desabilitar
-            if user['disabled']:
-                if col2.button("✅ Habilitar Usuário", key=f"enable_{user['uid']}"):
-                    auth.update_user(user['uid'], disabled=False)
-                    log_activity(st.session_state['username'], "User Enabled", f"User: {user['email']}")
-                    st.success(f"Usuário {user['email']} habilitado.")
-                    carregar_usuarios.clear() # <- CORREÇÃO: Limpa o cache
-                    st.rerun()
-            else:
-                if col2.button("🚫 Desabilitar Usuário", key=f"disable_{user['uid']}", type="primary"):
-                    auth.update_user(user['uid'], disabled=True)
-                    log_activity(st.session_state['username'], "User Disabled", f"User: {user['email']}")
-                    st.warning(f"Usuário {user['email']} desabilitado.")
-                    carregar_usuarios.clear() # <- CORREÇÃO: Limpa o cache
-                    st.rerun()
-
-            # Ações de Senha
-            if col3.button("🔑 Alterar Senha", key=f"pwd_{user['uid']}"):
-                st.session_state.change_password_uid = user['uid'] if st.session_state.change_password_uid != user['uid'] else None
-                st.rerun()
-
-            if st.session_state.change_password_uid == user['uid']:
-                with st.form(f"form_pwd_{user['uid']}", clear_on_submit=True):
-                    new_password = st.text_input("Nova Senha", type="password", key=f"new_pwd_input_{user['uid']}")
-                    if st.form_submit_button("Confirmar Nova Senha"):
-                        if len(new_password) >= 6:
-                            auth.update_user(user['uid'], password=new_password)
-                            log_activity(st.session_state['username'], "Password Changed", f"For user: {user['email']}")
-                            st.success(f"Senha do usuário {user['email']} alterada com sucesso!")
-                            st.session_state.change_password_uid = None
-                            st.rerun()
-                        else:
-                            st.error("A nova senha deve ter no mínimo 6 caracteres.")
+    pagina_atual = st.session_state.admin_pagina
+    inicio = pagina_atual * tamanho_pagina
+    # O próprio administrador não aparece na lista, como antes
+    proprio_uid = st.session_state.get('uid')
+    if busca.strip():
+        encontrados = diretorio.buscar(busca, excluir_uid=proprio_uid)
+        usuarios = encontrados[inicio:inicio + tamanho_pagina]
+        tem_proxima = len(encontrados) > inicio + tamanho_pagina
+        st.caption(f"{len(encontrados)} usuário(s) encontrado(s).")
+    else:
+        usuarios, tem_proxima = diretorio.pagina(inicio, tamanho_pagina, excluir_uid=proprio_uid)
+    usuarios_por_uid = {u['uid']: u for u in usuarios}
+
+    df_usuarios = pd.DataFrame([{
+        "Email": u['email'],
+        "Nível": u['role'].capitalize(),
+        "Status": "🔴 Desabilitado" if u['disabled'] else "🟢 Habilitado",
+        "Último acesso": u['last_sign_in'],
+    } for u in usuarios], columns=["Email", "Nível", "Status", "Último acesso"])
+
+    # A chave muda com a página e a busca, então a seleção não "vaza" para outras linhas
+    evento = st.dataframe(df_usuarios, hide_index=True, use_container_width=True,
+                          on_select="rerun", selection_mode="multi-row",
+                          key=f"tabela_usuarios_{busca}_{tamanho_pagina}_{pagina_atual}")
+    selecionados = [usuarios[i]['uid'] for i in evento.selection.rows]
+
+    # --- Ações em Lote ---
+    st.write(f"**{len(selecionados)} usuário(s) selecionado(s)**")
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 2])
+    if col1.button("✅ Habilitar", disabled=not selecionados):
+        sucesso, falhas = definir_status(selecionados, desabilitado=False)
+        registrar_resultado("User Enabled", "habilitado(s)", sucesso, falhas, usuarios_por_uid)
+        st.rerun()
+    if col2.button("🚫 Desabilitar", disabled=not selecionados, type="primary"):
+        sucesso, falhas = definir_status(selecionados, desabilitado=True)
+        registrar_resultado("User Disabled", "desabilitado(s)", sucesso, falhas, usuarios_por_uid)
+        st.rerun()
+    novo_papel = col3.selectbox("Novo nível", PAPEIS, key="admin_novo_papel", label_visibility="collapsed")
+    if col4.button("👤 Aplicar nível", disabled=not selecionados):
+        sucesso, falhas = definir_papel(selecionados, novo_papel)
+        registrar_resultado("User Role Changed", f"com nível {novo_papel}", sucesso, falhas, usuarios_por_uid)
+        st.rerun()
+
+    # --- Alteração de Senha (um usuário por vez) ---
+    if len(selecionados) == 1:
+        user = usuarios_por_uid[selecionados[0]]
+        with st.form(f"form_pwd_{user['uid']}", clear_on_submit=True):
+            st.write(f"Alterar a senha de **{user['email']}**")
+            new_password = st.text_input("Nova Senha", type="password", key=f"new_pwd_input_{user['uid']}")
+            if st.form_submit_button("🔑 Confirmar Nova Senha"):
+                if len(new_password) >= 6:
+                    auth.update_user(user['uid'], password=new_password)
+                    log_activity(st.session_state['username'], "Password Changed", f"For user: {user['email']}")
+                    st.success(f"Senha do usuário {user['email']} alterada com sucesso!")
+                else:
+                    st.error("A nova senha deve ter no mínimo 6 caracteres.")
+
+    # --- Navegação ---
+    col_anterior, col_info, col_proxima = st.columns([1, 2, 1])
+    if col_anterior.button("⬅️ Anterior", disabled=pagina_atual == 0, key="admin_pagina_anterior"):
+        st.session_state.admin_pagina -= 1
+        st.rerun()
+    col_info.write(f"Página {pagina_atual + 1}")
+    if col_proxima.button("Próxima ➡️", disabled=not tem_proxima, key="admin_pagina_proxima"):
+        st.session_state.admin_pagina += 1
+        st.rerun()
 
 except Exception as e:
     st.error(f"Erro ao carregar ou gerenciar usuários: {e}")
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-from firebase_utils import db
-from google.cloud.firestore_v1.query import Query
+from firebase_utils import obter_bucket
+from logs_consulta import buscar_logs, formatar_logs, formatar_registros, ACOES_LOG, COLUNAS_LOGS
+from logs_retencao import dias_arquivados, buscar_no_arquivo, DIAS_RETENCAO
 
 if st.session_state.get("role") != "admin":
     st.error("Acesso negado. Esta página é restrita a administradores.")
@@ -10,27 +11,66 @@ if st.session_state.get("role") != "admin":
 st.logo("logobd.png") # ADICIONADO AQUI
 st.title("Logs de Atividade do Sistema")
 
-@st.cache_data(ttl=60)
-def carregar_logs():
-    logs_ref = db.collection("logs").order_by("timestamp", direction=Query.DESCENDING).limit(200).stream()
-    logs = []
-    for doc in logs_ref:
-        log_data = doc.to_dict()
-        # Garante que o timestamp existe antes de formatar
-        if 'timestamp' in log_data and log_data['timestamp']:
-            log_data['timestamp'] = pd.to_datetime(log_data['timestamp']).strftime('%d/%m/%Y %H:%M:%S')
-        else:
-            log_data['timestamp'] = 'N/A'
-        logs.append(log_data)
-
-    if not logs:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(logs)
-    return df
-
-df_logs = carregar_logs()
-if not df_logs.empty:
-    st.dataframe(df_logs, use_container_width=True, hide_index=True)
+# --- Filtros (aplicados na consulta ao Firestore) ---
+col1, col2, col3 = st.columns([2, 2, 2])
+usuario = col1.text_input("Email do usuário", key="logs_usuario").strip()
+acao = col2.selectbox("Ação", ["Todas"] + ACOES_LOG, key="logs_acao")
+periodo = col3.date_input("Período", value=(), key="logs_periodo", format="DD/MM/YYYY")
+
+data_inicio = periodo[0] if len(periodo) > 0 else None
+data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+filtros = (usuario or None, None if acao == "Todas" else acao, data_inicio, data_fim)
+
+# --- Páginas já carregadas nesta sessão ---
+# Reruns (e o botão "Carregar mais") não releem o que já está na tela
+estado = st.session_state.get('logs_consulta')
+atualizar = st.button("🔄 Atualizar")
+if estado is None or estado['filtros'] != filtros or atualizar:
+    docs, tem_mais = buscar_logs(*filtros)
+    estado = {
+        "filtros": filtros,
+        "paginas": [formatar_logs(docs)] if docs else [],
+        "cursor": docs[-1] if docs else None,
+        "tem_mais": tem_mais,
+    }
+    st.session_state.logs_consulta = estado
+
+if estado['paginas']:
+    df_logs = pd.concat(estado['paginas'], ignore_index=True)
+    st.caption(f"{len(df_logs)} registro(s) carregado(s).")
+    st.dataframe(df_logs[COLUNAS_LOGS], use_container_width=True, hide_index=True)
+    if estado['tem_mais'] and st.button("Carregar mais"):
+        docs, tem_mais = buscar_logs(*filtros, cursor=estado['cursor'])
+        if docs:
+            estado['paginas'].append(formatar_logs(docs))
+            estado['cursor'] = docs[-1]
+        estado['tem_mais'] = tem_mais
+        st.rerun()
+elif any(filtros):
+    st.info("Nenhum log encontrado com esses filtros.")
 else:
     st.info("Nenhum log de atividade registrado.")
+
+# --- Logs arquivados (mais antigos que o período de retenção) ---
+MAX_LINHAS_ARQUIVO = 5000
+
+@st.cache_data(ttl=300)
+def carregar_dias_arquivados():
+    return dias_arquivados(obter_bucket())
+
+with st.expander(f"📦 Logs arquivados (mais de {DIAS_RETENCAO} dias)"):
+    dias = carregar_dias_arquivados()
+    if not dias:
+        st.info("Nenhum dia arquivado ainda.")
+    else:
+        dia = st.selectbox("Dia", dias, format_func=lambda d: d.strftime('%d/%m/%Y'), key="logs_dia_arquivo")
+        st.caption("Os filtros de usuário e ação acima também valem aqui.")
+        if st.button("Buscar no arquivo"):
+            with st.spinner("Lendo o arquivo do dia..."):
+                registros = buscar_no_arquivo(obter_bucket(), dia, filtros[0], filtros[1], limite=MAX_LINHAS_ARQUIVO)
+            if registros:
+                if len(registros) == MAX_LINHAS_ARQUIVO:
+                    st.warning(f"Mostrando só os primeiros {MAX_LINHAS_ARQUIVO} registros; refine os filtros.")
+                st.dataframe(formatar_registros(registros), use_container_width=True, hide_index=True)
+            else:
+                st.info("Nenhum registro desse dia com esses filtros.")
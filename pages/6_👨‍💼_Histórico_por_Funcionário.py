@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from firebase_utils import db
+from funcionarios_index import carregar_nomes_funcionarios
+from aso_repository import repositorio_asos
+from busca_nomes import indice_nomes
+from anexos import url_anexo, url_miniatura, nome_do_anexo
 from datetime import datetime
-from google.api_core.exceptions import FailedPrecondition
 
 # --- Verificação de Login ---
 if not st.session_state.get("authentication_status"):
@@ -14,21 +16,30 @@ st.logo("logobd.png")
 st.title("Histórico de ASO por Funcionário")
 
 # --- Função para carregar nomes únicos de funcionários ---
-@st.cache_data(ttl=60)
+# Lidos do índice `funcionarios` (um documento por funcionário), sem varrer os ASOs
 def carregar_funcionarios():
-    docs = db.collection("asos").stream()
-    nomes = sorted(list(set(doc.to_dict().get('nome_funcionario') for doc in docs if doc.to_dict().get('nome_funcionario'))))
-    return nomes
+    return carregar_nomes_funcionarios()
 
 # --- Interface ---
 funcionarios = carregar_funcionarios()
 if not funcionarios:
     st.warning("Nenhum funcionário com ASO encontrado.")
+    st.caption("Se já existem ASOs cadastrados, reconstrua o índice com `python funcionarios_index.py --rebuild`.")
     st.stop()
 
+# Busca sem acento ("joao" encontra "João"); a lista mostra no máximo LIMITE_OPCOES nomes
+LIMITE_OPCOES = 500
+busca = st.text_input("Buscar funcionário", placeholder="Digite parte do nome, com ou sem acento...")
+opcoes = indice_nomes(funcionarios).buscar(busca, limite=LIMITE_OPCOES + 1)
+if len(opcoes) > LIMITE_OPCOES:
+    opcoes = opcoes[:LIMITE_OPCOES]
+    st.caption(f"Mostrando os primeiros {LIMITE_OPCOES} nomes; refine a busca para ver outros.")
+elif busca and not opcoes:
+    st.info("Nenhum funcionário encontrado com esse nome.")
+
 funcionario_selecionado = st.selectbox(
     "Selecione um funcionário para ver o histórico",
-    options=funcionarios,
+    options=opcoes,
     index=None,
     placeholder="Digite ou selecione um nome..."
 )
@@ -37,16 +48,13 @@ if funcionario_selecionado:
     st.subheader(f"Histórico de: {funcionario_selecionado}")
     
     try:
-        # Busca todos os ASOs para o funcionário selecionado, ordenados pela data do exame
-        docs = db.collection('asos').where('nome_funcionario', '==', funcionario_selecionado).order_by('data_exame', direction='DESCENDING').stream()
-        
-        historico = list(docs) # Converte o iterador para uma lista para verificar se está vazia
+        # ASOs do funcionário vêm do repositório compartilhado, já ordenados pela data do exame
+        historico = repositorio_asos().por_funcionario(funcionario_selecionado)
 
         if not historico:
             st.info("Nenhum ASO encontrado para este funcionário.")
         else:
-            for aso_doc in historico:
-                aso = aso_doc.to_dict()
+            for aso in historico:
                 with st.container(border=True):
                     col1, col2 = st.columns(2)
                     
@@ -63,18 +71,14 @@ if funcionario_selecionado:
 
                     if 'anexos' in aso and aso['anexos']:
                         with st.expander("Ver Anexos"):
-                            for anexo_url in aso['anexos']:
-                                try:
-                                    file_name = anexo_url.split('%2F')[-1].split('?')[0].replace('%20', ' ')
-                                except:
-                                    file_name = "Link do Anexo"
-                                st.link_button(f"Baixar {file_name}", anexo_url)
+                            miniaturas = [m for m in map(url_miniatura, aso['anexos']) if m]
+                            if miniaturas:
+                                st.image(miniaturas, width=120)
+                            for anexo in aso['anexos']:
+                                st.link_button(f"Baixar {nome_do_anexo(anexo)}", url_anexo(anexo))
                     elif 'url_arquivo_aso' in aso and aso['url_arquivo_aso']:
                          with st.expander("Ver Anexo"):
-                            st.link_button("Baixar ASO", aso['url_arquivo_aso'])
+                            st.link_button("Baixar ASO", url_anexo(aso['url_arquivo_aso']))
     
-    except FailedPrecondition:
-        st.error("ERRO: O banco de dados precisa de um índice para esta consulta.")
-        st.warning("Para corrigir, vá para os logs da aplicação no Streamlit Cloud, encontre a mensagem de erro 'FailedPrecondition' e clique no link fornecido para criar o índice no Firebase.")
     except Exception as e:
         st.error(f"Ocorreu um erro inesperado: {e}")
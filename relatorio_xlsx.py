@@ -0,0 +1,88 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pandas as pd
+from openpyxl import Workbook
+from firebase_utils import obter_db
+from aso_status import classificar_status
+
+# --- Exportação de relatórios em XLSX ---
+# Os ASOs vêm de um iterável de dicts (o repositório compartilhado, nas
+# páginas) ou, por padrão, do Firestore em fluxo, só com os campos do
+# relatório. São classificados em blocos. Cada bloco é escrito direto numa planilha
+# openpyxl em modo write-only, então a memória usada não cresce com o
+# número de linhas do relatório.
+
+COLUNAS_EXPORTAR = {
+    'nome_funcionario': 'Funcionário',
+    'funcao': 'Função',
+    'tipo_exame': 'Tipo de Exame',
+    'resultado': 'Resultado',
+    'data_exame': 'Data do Exame',
+    'data_vencimento': 'Data de Vencimento',
+    'Status': 'Status',
+    'lancado_por': 'Lançado Por'
+}
+CAMPOS_FIRESTORE = [c for c in COLUNAS_EXPORTAR if c != 'Status']
+TAMANHO_BLOCO = 5000
+
+
+def _formatar_data(serie):
+    return pd.to_datetime(serie, utc=True).dt.strftime('%d/%m/%Y').fillna('')
+
+
+def _escrever_bloco(planilha, registros, status_selecionados, hoje):
+    df = pd.DataFrame(registros).reindex(columns=CAMPOS_FIRESTORE)
+    df = classificar_status(df, hoje=hoje)
+    df = df[df['Status'].isin(status_selecionados)].copy()
+    if df.empty:
+        return 0
+    df['data_exame'] = _formatar_data(df['data_exame'])
+    df['data_vencimento'] = _formatar_data(df['data_vencimento'])
+    linhas = df[list(COLUNAS_EXPORTAR)].astype(object)
+    linhas = linhas.where(linhas.notna(), None)
+    for linha in linhas.itertuples(index=False, name=None):
+        planilha.append(linha)
+    return len(df)
+
+
+def _documentos_firestore():
+    for doc in obter_db().collection("asos").select(CAMPOS_FIRESTORE).stream():
+        yield doc.to_dict()
+
+
+def gerar_relatorio_xlsx(status_selecionados, caminho, documentos=None):
+    """
+    Gera o relatório em `caminho` com os ASOs cujo status está em
+    `status_selecionados`. `documentos` é um iterável de dicts; sem ele, os
+    ASOs são lidos do Firestore. Devolve o número de linhas escritas.
+    """
+    hoje = datetime.now(timezone.utc)
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet('Relatório ASOs')
+    planilha.append(list(COLUNAS_EXPORTAR.values()))
+
+    total = 0
+    registros = []
+    for documento in (documentos if documentos is not None else _documentos_firestore()):
+        registros.append(documento)
+        if len(registros) == TAMANHO_BLOCO:
+            total += _escrever_bloco(planilha, registros, status_selecionados, hoje)
+            registros = []
+    if registros:
+        total += _escrever_bloco(planilha, registros, status_selecionados, hoje)
+
+    workbook.save(caminho)
+    return total
+
+
+def gerar_relatorio_temporario(status_selecionados, documentos=None):
+    """Gera o relatório num arquivo temporário. Devolve (caminho, linhas); o chamador apaga o arquivo."""
+    descritor, caminho = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descritor)
+    try:
+        return caminho, gerar_relatorio_xlsx(status_selecionados, caminho, documentos)
+    except Exception:
+        os.remove(caminho)
+        raise
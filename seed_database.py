@@ -88,7 +88,8 @@ try:
             "crm_medico": "98765-BR",
             "url_arquivo_aso": None,
             "lancado_por": "script_seed",
-            "data_lancamento": firestore.SERVER_TIMESTAMP
+            "data_lancamento": firestore.SERVER_TIMESTAMP,
+            "updated_at": firestore.SERVER_TIMESTAMP
         }
         
         db.collection('asos').add(aso_data)
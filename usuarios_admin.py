@@ -0,0 +1,167 @@
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import streamlit as st
+from firebase_admin import auth
+from firebase_utils import obter_app
+
+# --- Diretório de usuários para o Admin ---
+# Cópia local (por processo) das contas do Firebase Auth, carregada por páginas
+# de `auth.list_users` conforme a tela precisa: a primeira página aparece sem
+# esperar a lista inteira, e a busca por prefixo de email usa um índice
+# ordenado (bisect). Alterações feitas pelo Admin corrigem só a linha afetada,
+# sem reler todas as contas. As páginas são lidas do Auth fora do lock dos
+# dados (um carregamento por vez, em `_lock_carga`), então quem só precisa do
+# que já está carregado não espera a lista inteira.
+
+TAMANHO_PAGINA_AUTH = 1000  # máximo permitido por auth.list_users
+VALIDADE_DIRETORIO = 10 * 60
+MAX_ACOES_SIMULTANEAS = 8
+PAPEIS = ["usuario", "admin"]
+
+
+def _linha(user):
+    role = user.custom_claims.get('role', 'usuario') if user.custom_claims else 'usuario'
+    last_signed_in = 'Nunca'
+    if user.user_metadata and user.user_metadata.last_sign_in_timestamp:
+        last_signed_in = datetime.fromtimestamp(user.user_metadata.last_sign_in_timestamp / 1000).strftime('%d/%m/%Y %H:%M')
+    return {
+        "uid": user.uid,
+        "email": user.email or "",
+        "role": role,
+        "disabled": user.disabled,
+        "last_sign_in": last_signed_in
+    }
+
+
+class DiretorioUsuarios:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._geracao = 0
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._geracao += 1     # páginas pedidas antes de recarregar são descartadas
+        self.linhas = {}       # uid -> linha, na ordem de carregamento
+        self._emails = []      # [(email em minúsculas, uid)] ordenado
+        self._proximo_token = None
+        self.completo = False
+        self.carregado_em = time.time()
+
+    def recarregar(self):
+        with self._lock:
+            self._reiniciar()
+
+    def _carregar_pagina(self):
+        # Chamado com _lock_carga; a chamada ao Auth não segura _lock
+        with self._lock:
+            token, geracao = self._proximo_token, self._geracao
+        obter_app()
+        pagina = auth.list_users(page_token=token, max_results=TAMANHO_PAGINA_AUTH)
+        linhas = [_linha(user) for user in pagina.users]
+        with self._lock:
+            if geracao != self._geracao:
+                return
+            for linha in linhas:
+                if linha['uid'] not in self.linhas:
+                    bisect.insort(self._emails, (linha['email'].lower(), linha['uid']))
+                self.linhas[linha['uid']] = linha
+            self._proximo_token = pagina.next_page_token
+            self.completo = not pagina.has_next_page
+
+    def _carregado(self, quantidade):
+        return self.completo or (quantidade is not None and len(self.linhas) >= quantidade)
+
+    def garantir(self, quantidade=None):
+        """Carrega páginas até ter `quantidade` usuários (None = todos)."""
+        with self._lock:
+            if time.time() - self.carregado_em > VALIDADE_DIRETORIO:
+                self._reiniciar()
+            if self._carregado(quantidade):
+                return self
+        with self._lock_carga:
+            while True:
+                with self._lock:
+                    if self._carregado(quantidade):
+                        return self
+                self._carregar_pagina()
+
+    def pagina(self, inicio, tamanho, excluir_uid=None):
+        """
+        Linhas [inicio, inicio + tamanho) na ordem do Firebase Auth, sem o
+        usuário `excluir_uid`, carregando o necessário.
+        """
+        self.garantir(inicio + tamanho + 1 + (1 if excluir_uid else 0))
+        with self._lock:
+            linhas = [l for l in self.linhas.values() if l['uid'] != excluir_uid]
+        return [dict(l) for l in linhas[inicio:inicio + tamanho]], len(linhas) > inicio + tamanho
+
+    def buscar(self, prefixo, excluir_uid=None):
+        """
+        Usuários cujo email começa com `prefixo` (sem diferenciar maiúsculas),
+        em ordem alfabética, sem o usuário `excluir_uid`.
+        """
+        self.garantir()
+        prefixo = prefixo.strip().lower()
+        with self._lock:
+            inicio = bisect.bisect_left(self._emails, (prefixo, ""))
+            fim = bisect.bisect_left(self._emails, (prefixo + "\uffff", ""))
+            return [dict(self.linhas[uid]) for _, uid in self._emails[inicio:fim] if uid != excluir_uid]
+
+    def atualizar_linha(self, uid, **campos):
+        with self._lock:
+            if uid in self.linhas:
+                self.linhas[uid] = {**self.linhas[uid], **campos}
+
+    def adicionar(self, user, **campos):
+        linha = {**_linha(user), **campos}
+        with self._lock:
+            if linha['uid'] not in self.linhas:
+                bisect.insort(self._emails, (linha['email'].lower(), linha['uid']))
+            self.linhas[linha['uid']] = linha
+
+
+@st.cache_resource
+def obter_diretorio_usuarios():
+    # Compartilhado pelas sessões do processo, como o repositório de ASOs
+    return DiretorioUsuarios()
+
+
+def executar_em_lote(uids, acao):
+    """
+    Executa `acao(uid)` para vários usuários em paralelo. Devolve
+    (uids com sucesso, {uid: mensagem de erro}).
+    """
+    sucesso, falhas = [], {}
+    if not uids:
+        return sucesso, falhas
+    obter_app()
+    with ThreadPoolExecutor(max_workers=min(MAX_ACOES_SIMULTANEAS, len(uids))) as executor:
+        futuros = {uid: executor.submit(acao, uid) for uid in uids}
+        for uid, futuro in futuros.items():
+            try:
+                futuro.result()
+                sucesso.append(uid)
+            except Exception as e:
+                falhas[uid] = str(e)
+    return sucesso, falhas
+
+
+def definir_status(uids, desabilitado):
+    sucesso, falhas = executar_em_lote(uids, lambda uid: auth.update_user(uid, disabled=desabilitado))
+    diretorio = obter_diretorio_usuarios()
+    for uid in sucesso:
+        diretorio.atualizar_linha(uid, disabled=desabilitado)
+    return sucesso, falhas
+
+
+def definir_papel(uids, papel):
+    sucesso, falhas = executar_em_lote(uids, lambda uid: auth.set_custom_user_claims(uid, {'role': papel}))
+    diretorio = obter_diretorio_usuarios()
+    for uid in sucesso:
+        diretorio.atualizar_linha(uid, role=papel)
+    return sucesso, falhas